@@ -1,7 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import copy
+import json
+import os
+import sys
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic, perf_counter, perf_counter_ns, time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for the columnar batch mode
+    np = None
 
 
 class Handler(ABC):
@@ -16,52 +32,863 @@ class Handler(ABC):
 
 class AbstractHandler(Handler):
     _next_handler: Handler = None
+    # check may run in any order relative to other commutative handlers; when several of them would reject
+    # a request, AdaptiveChain may return the message of a different one than the linked chain does
+    commutative: bool = False
+    cache_key: Optional[Tuple[str, ...]] = None  # request fields the result depends on, if it is deterministic
+    process_affinity: str = 'worker'  # 'worker' - copied into every worker process, 'pinned' - runs in the parent
 
     def set_next(self, handler: Handler) -> Handler:
         self._next_handler = handler
         return handler
 
     def handle(self, request: Any) -> Optional[str]:
-        if self._next_handler:
+        result = self.check(request)
+        if result is not None:
+            return result
+        if self._next_handler is not None:
             return self._next_handler.handle(request)
         return None
 
+    def check(self, request: Any) -> Optional[str]:
+        """
+        Own step of the handler: returns a result to stop the chain or None to pass the request on.
+        """
+        return None
 
-class AuthenticationHandler(AbstractHandler):
-    def handle(self, request: dict) -> Optional[str]:
-        if not request.get('authenticated'):
-            return "AuthenticationHandler: Authentication failed"
-        return super().handle(request)
+    def compile(self) -> CompiledChain:
+        """
+        Freezes the chain starting at this handler into a flat, loop-driven dispatcher.
+        Handlers that override `handle` themselves are kept as the tail of the dispatcher.
+        """
+        checks = []
+        tail = None
+        handler = self
+        while handler is not None:
+            if not isinstance(handler, AbstractHandler) or type(handler).handle is not AbstractHandler.handle:
+                tail = handler.handle
+                break
+            if type(handler).check is not AbstractHandler.check:
+                checks.append(handler.check)
+            handler = handler._next_handler
+        return CompiledChain(checks, tail)
 
+    def instrument(self) -> ChainMetrics:
+        """
+        Wraps the check of every handler in the chain with timing and outcome counters.
+        Call `uninstrument()` on the result to remove the wrappers again.
+        """
+        return ChainMetrics(self)
 
-class AuthorizationHandler(AbstractHandler):
-    def handle(self, request: dict) -> Optional[str]:
-        if not request.get('authorized'):
-            return "AuthorizationHandler: Authorization failed"
-        return super().handle(request)
+    def adaptive(self, reorder_every: int = 1000, decay: float = 0.5) -> AdaptiveChain:
+        """
+        Freezes the chain into a dispatcher that reorders commutative handlers by observed cost and rejection rate.
+        """
+        return AdaptiveChain(self, reorder_every, decay)
+
+    def reject_mask(self, columns: Dict[str, Sequence], size: int) -> Optional[np.ndarray]:
+        """
+        Vectorized form of `check`: boolean mask of the rows rejected with `message`, or None if not supported.
+        """
+        return None
+
+    def handle_columns(self, columns: Dict[str, Sequence]) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """
+        Columnar batch mode: `columns` maps request fields to equal-length arrays.
+        Returns one code per request and the list of results the codes index into (code 0 - None).
+        Handlers without `reject_mask` are run row by row on the requests that are still pending.
+        """
+        if np is None:
+            raise ImportError("handle_columns requires numpy")
+        columns = {name: np.asarray(column) for name, column in columns.items()}
+        size = len(next(iter(columns.values()))) if columns else 0
+        codes = np.zeros(size, dtype=np.int32)
+        pending = np.ones(size, dtype=bool)
+        results: List[Optional[str]] = [None]
+        result_codes: Dict[str, int] = {}
+        rows: Dict[int, dict] = {}
+        lists = None
+
+        def code_of(result: str) -> int:
+            if result not in result_codes:
+                result_codes[result] = len(results)
+                results.append(result)
+            return result_codes[result]
+
+        handler = self
+        while handler is not None and pending.any():
+            flat = isinstance(handler, AbstractHandler) and type(handler).handle is AbstractHandler.handle
+            mask = handler.reject_mask(columns, size) if flat else None
+            if mask is not None:
+                mask &= pending
+                codes[mask] = code_of(handler.message)
+                pending &= ~mask
+            else:
+                if lists is None:
+                    lists = {name: column.tolist() for name, column in columns.items()}
+                call = handler.check if flat else handler.handle
+                for i in np.flatnonzero(pending).tolist():
+                    row = rows.get(i)
+                    if row is None:
+                        row = rows[i] = {name: values[i] for name, values in lists.items()}
+                    result = call(row)
+                    if result is not None:
+                        codes[i] = code_of(result)
+                        pending[i] = False
+            handler = handler._next_handler if flat else None
+        return codes, results
+
+
+class CompiledChain:
+    def __init__(self, checks: List[Callable[[Any], Optional[str]]],
+                 tail: Optional[Callable[[Any], Optional[str]]] = None) -> None:
+        self._checks = tuple(checks)
+        self._tail = tail
+
+    def handle(self, request: Any) -> Optional[str]:
+        for check in self._checks:
+            result = check(request)
+            if result is not None:
+                return result
+        if self._tail is not None:
+            return self._tail(request)
+        return None
+
+    def handle_many(self, requests: Iterable[Any]) -> List[Optional[str]]:
+        checks = self._checks
+        tail = self._tail
+        results = []
+        append = results.append
+        for request in requests:
+            for check in checks:
+                result = check(request)
+                if result is not None:
+                    break
+            else:
+                result = tail(request) if tail is not None else None
+            append(result)
+        return results
+
+    def __len__(self) -> int:
+        return len(self._checks) + (self._tail is not None)
+
+
+class AdaptiveChain:
+    """
+    Orders every run of adjacent commutative handlers by `cost / rejection probability`,
+    which minimizes the expected cost per request for independent checks.
+    Non-commutative handlers stay pinned at their positions and split the chain into segments.
+    Outcomes are counted for every request, while the cost is timed on every `sample_every`-th one only.
+    Statistics are multiplied by `decay` after every reorder, so the order follows changes in traffic.
+
+    Which requests pass is the same as in the linked chain, but a request rejected by several commutative
+    handlers gets the message of whichever runs first: e.g. "Authorization failed" instead of
+    "Authentication failed" once AuthorizationHandler is moved to the front.
+    """
+
+    def __init__(self, head: Handler, reorder_every: int = 1000, decay: float = 0.5, sample_every: int = 16) -> None:
+        self._handlers: List[AbstractHandler] = []
+        self._tail = None
+        handler = head
+        while handler is not None:
+            if not isinstance(handler, AbstractHandler) or type(handler).handle is not AbstractHandler.handle:
+                self._tail = handler.handle
+                break
+            self._handlers.append(handler)
+            handler = handler._next_handler
+
+        size = len(self._handlers)
+        self._checks = [handler.check for handler in self._handlers]
+        self._order = list(range(size))
+        self._calls = [0.0] * size
+        self._rejects = [0.0] * size
+        self._cost_ns = [0.0] * size
+        self._timed = [0.0] * size
+        self._sample_every = sample_every
+        self._reorder_every = reorder_every
+        self._decay = decay
+        self._requests = 0
+
+    @property
+    def order(self) -> List[str]:
+        return [type(self._handlers[i]).__name__ for i in self._order]
+
+    def handle(self, request: Any) -> Optional[str]:
+        self._requests += 1
+        if self._requests >= self._reorder_every:
+            self.reorder()
+
+        checks, calls, rejects = self._checks, self._calls, self._rejects
+        if self._requests % self._sample_every:
+            for i in self._order:
+                result = checks[i](request)
+                calls[i] += 1
+                if result is not None:
+                    rejects[i] += 1
+                    return result
+        else:
+            cost_ns, timed = self._cost_ns, self._timed
+            for i in self._order:
+                start = perf_counter_ns()
+                result = checks[i](request)
+                cost_ns[i] += perf_counter_ns() - start
+                timed[i] += 1
+                calls[i] += 1
+                if result is not None:
+                    rejects[i] += 1
+                    return result
+        if self._tail is not None:
+            return self._tail(request)
+        return None
+
+    def handle_many(self, requests: Iterable[Any]) -> List[Optional[str]]:
+        return [self.handle(request) for request in requests]
+
+    def reorder(self) -> None:
+        order = []
+        segment = []
+        for i in self._order:
+            if self._handlers[i].commutative:
+                segment.append(i)
+                continue
+            order.extend(sorted(segment, key=self._rank))
+            order.append(i)
+            segment = []
+        order.extend(sorted(segment, key=self._rank))
+        self._order = order
+
+        for stats in (self._calls, self._rejects, self._cost_ns, self._timed):
+            for i in range(len(stats)):
+                stats[i] *= self._decay
+        self._requests = 0
+
+    def _rank(self, i: int) -> float:
+        calls = self._calls[i]
+        cost = self._cost_ns[i] / self._timed[i] if self._timed[i] else 0.0
+        rejection_probability = (self._rejects[i] + 1) / (calls + 2)
+        return cost / rejection_probability
+
+
+class LatencyHistogram:
+    """
+    Power-of-two buckets of nanoseconds: bucket `i` holds the values with `i` significant bits.
+    """
+    __slots__ = ('counts', 'count', 'total_ns', 'max_ns')
+
+    def __init__(self) -> None:
+        self.counts = [0] * 65
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int) -> None:
+        self.counts[ns.bit_length()] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q: float) -> int:
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min((1 << bucket) - 1, self.max_ns)
+        return self.max_ns
+
+    def snapshot(self) -> dict:
+        return {
+            'p50_ns': self.percentile(0.5),
+            'p99_ns': self.percentile(0.99),
+            'max_ns': self.max_ns,
+            'mean_ns': self.total_ns // self.count if self.count else 0,
+        }
+
+
+class HandlerStats:
+    __slots__ = ('name', 'calls', 'rejects', 'passes', 'latency')
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.rejects = 0
+        self.passes = 0
+        self.latency = LatencyHistogram()
+
+    def snapshot(self) -> dict:
+        return {'calls': self.calls, 'rejects': self.rejects, 'passes': self.passes, **self.latency.snapshot()}
+
+
+class ChainMetrics:
+    """
+    Per-handler call/reject/pass counters and latency of the handler's own step (`check`).
+    Handlers that override `handle` themselves are not instrumented.
+    """
+
+    def __init__(self, head: Handler) -> None:
+        self._instrumented: List[AbstractHandler] = []
+        self.handlers: List[HandlerStats] = []
+        handler = head
+        while isinstance(handler, AbstractHandler) and type(handler).handle is AbstractHandler.handle:
+            stats = HandlerStats(f"{len(self.handlers)}:{type(handler).__name__}")
+            handler.check = self._timed(handler.check, stats)
+            self._instrumented.append(handler)
+            self.handlers.append(stats)
+            handler = handler._next_handler
+
+    @staticmethod
+    def _timed(check: Callable[[Any], Optional[str]], stats: HandlerStats) -> Callable[[Any], Optional[str]]:
+        record = stats.latency.record
+
+        def timed_check(request: Any) -> Optional[str]:
+            stats.calls += 1
+            start = perf_counter_ns()
+            result = check(request)
+            record(perf_counter_ns() - start)
+            if result is None:
+                stats.passes += 1
+            else:
+                stats.rejects += 1
+            return result
+
+        return timed_check
+
+    def uninstrument(self) -> None:
+        for handler in self._instrumented:
+            del handler.check
+        self._instrumented.clear()
+
+    def snapshot(self) -> dict:
+        return {stats.name: stats.snapshot() for stats in self.handlers}
+
+    def to_json(self, **kwargs: Any) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+class PredicateHandler(AbstractHandler):
+    """
+    Rejects requests whose `field` is falsy with `message`.
+    """
+    commutative = True
+    field: str
+    message: str
+
+    def check(self, request: dict) -> Optional[str]:
+        if not request.get(self.field):
+            return self.message
+        return None
+
+    def reject_mask(self, columns: Dict[str, Sequence], size: int) -> Optional[np.ndarray]:
+        column = columns.get(self.field)
+        if column is None:
+            return np.ones(size, dtype=bool)
+        return ~column.astype(bool)
+
+
+class CachedHandler(AbstractHandler):
+    """
+    Caches the results of a deterministic handler or sub-chain keyed on the request fields `key_fields`.
+    By default the key is the union of `cache_key` of the handlers in the sub-chain.
+    Keeps at most `max_size` results (least recently used go first), each for `ttl` seconds if it is set.
+    A cached None passes the request on to the next handler of this one.
+    """
+    _MISSING = object()
+    process_affinity = 'pinned'
+
+    def __init__(self, handler: Handler, key_fields: Optional[Sequence[str]] = None, max_size: int = 10_000,
+                 ttl: Optional[float] = None, clock: Callable[[], float] = monotonic) -> None:
+        if key_fields is None:
+            key_fields = self._declared_key(handler)
+        self._handler = handler
+        self._key_fields = tuple(key_fields)
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = Lock()
+        self._results: OrderedDict = OrderedDict()  # key -> (result, expires at)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _declared_key(handler: Handler) -> Tuple[str, ...]:
+        fields = []
+        while handler is not None:
+            if getattr(handler, 'cache_key', None) is None:
+                raise ValueError(f"{type(handler).__name__} doesn't declare cache_key, pass key_fields explicitly")
+            fields.extend(field for field in handler.cache_key if field not in fields)
+            handler = getattr(handler, '_next_handler', None)
+        return tuple(fields)
+
+    def check(self, request: dict) -> Optional[str]:
+        key = tuple(request.get(field) for field in self._key_fields)
+        try:
+            hash(key)
+        except TypeError:
+            return self._handler.handle(request)
+
+        now = self._clock()
+        with self._lock:
+            result, expires_at = self._results.get(key, (self._MISSING, None))
+            if result is not self._MISSING and (expires_at is None or expires_at > now):
+                self._results.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+
+        result = self._handler.handle(request)
+
+        with self._lock:
+            self._results[key] = (result, None if self._ttl is None else now + self._ttl)
+            self._results.move_to_end(key)
+            while len(self._results) > self._max_size:
+                self._results.popitem(last=False)
+                self.evictions += 1
+        return result
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._results.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._results), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class AuthenticationHandler(PredicateHandler):
+    field = 'authenticated'
+    cache_key = ('authenticated',)
+    message = "AuthenticationHandler: Authentication failed"
+
+
+class AuthorizationHandler(PredicateHandler):
+    field = 'authorized'
+    cache_key = ('authorized',)
+    message = "AuthorizationHandler: Authorization failed"
+
+
+class _RateLimitShard:
+    __slots__ = ('lock', 'states')
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.states: OrderedDict = OrderedDict()
 
 
 class RateLimitHandler(AbstractHandler):
-    def __init__(self, max_requests: int):
+    """
+    Allows `max_requests` per `period` seconds for every client key taken from `request[key]`.
+
+    mode="token_bucket" - bucket of `max_requests` tokens refilled continuously over `period`.
+    mode="sliding_window" - weighted counter over the current and the previous window.
+
+    Keys are spread over `shards` dicts, each guarded by its own lock. Keys not seen for `idle_ttl`
+    seconds (by default `period`, or `2 * period` in sliding window mode, where the previous window
+    still counts for one more period) are expired, and each shard keeps at most `max_keys // shards` keys
+    (least recently seen go first).
+    """
+    MODES = ('token_bucket', 'sliding_window')
+    process_affinity = 'pinned'
+
+    def __init__(self, max_requests: int, period: float = 60.0, mode: str = 'token_bucket',
+                 key: Optional[str] = None, shards: int = 16, idle_ttl: Optional[float] = None,
+                 max_keys: int = 1_000_000, clock: Callable[[], float] = monotonic):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown rate limit mode: {mode!r}")
         self.max_requests = max_requests
-        self.current_requests = 0
+        self.period = period
+        self.mode = mode
+        self.key = key
+        if idle_ttl is None:
+            idle_ttl = 2 * period if mode == 'sliding_window' else period
+        self.idle_ttl = idle_ttl
+        self._max_keys_per_shard = max(1, max_keys // shards)
+        self._shards = [_RateLimitShard() for _ in range(shards)]
+        self._clock = clock
+        self._rate = max_requests / period
 
-    def handle(self, request: dict) -> Optional[str]:
-        if self.current_requests >= self.max_requests:
+    def check(self, request: dict) -> Optional[str]:
+        key = request.get(self.key) if self.key is not None else None
+        if not self.allow(key):
             return "RateLimitHandler: Rate limit exceeded"
-        self.current_requests += 1
-        return super().handle(request)
+        return None
+
+    def allow(self, key: Any = None) -> bool:
+        now = self._clock()
+        shard = self._shards[hash(key) % len(self._shards)]
+        with shard.lock:
+            states = shard.states
+            self._expire(states, now, key)
+            state = states.get(key)
+            if state is None:
+                state = self._new_state(now)
+                states[key] = state
+            else:
+                states.move_to_end(key)
+            if self.mode == 'token_bucket':
+                return self._take_token(state, now)
+            return self._count_in_window(state, now)
+
+    def size(self) -> int:
+        """
+        Number of client keys currently tracked.
+        """
+        return sum(len(shard.states) for shard in self._shards)
+
+    def _new_state(self, now: float) -> list:
+        if self.mode == 'token_bucket':
+            return [float(self.max_requests), now]  # tokens, last seen
+        return [0, 0, now, now]  # previous window count, current window count, window start, last seen
+
+    def _expire(self, states: OrderedDict, now: float, key: Any) -> None:
+        deadline = now - self.idle_ttl
+        while states:
+            oldest, state = next(iter(states.items()))
+            if state[-1] > deadline:
+                break
+            del states[oldest]
+        if key not in states:  # make room for the new key; a tracked one never loses its state to the limit
+            while len(states) >= self._max_keys_per_shard:
+                states.popitem(last=False)
+
+    def _take_token(self, state: list, now: float) -> bool:
+        tokens = min(self.max_requests, state[0] + (now - state[1]) * self._rate)
+        state[1] = now
+        if tokens < 1:
+            state[0] = tokens
+            return False
+        state[0] = tokens - 1
+        return True
+
+    def _count_in_window(self, state: list, now: float) -> bool:
+        previous, current, window_start, _ = state
+        elapsed = now - window_start
+        if elapsed >= self.period:
+            windows_passed = int(elapsed // self.period)
+            previous = current if windows_passed == 1 else 0
+            current = 0
+            window_start += windows_passed * self.period
+            elapsed = now - window_start
+        estimated = previous * (1 - elapsed / self.period) + current
+        allowed = estimated < self.max_requests
+        if allowed:
+            current += 1
+        state[:] = [previous, current, window_start, now]
+        return allowed
 
 
 class LoggingHandler(AbstractHandler):
-    def handle(self, request: dict) -> Optional[str]:
+    def check(self, request: dict) -> Optional[str]:
         print(f"LoggingHandler: Logging request: {request}")
-        return super().handle(request)
+        return None
+
+
+class BufferedLoggingHandler(AbstractHandler):
+    """
+    Puts a (timestamp, repr of the request) record on a bounded queue and returns immediately,
+    so later changes to the request don't show up in the log.
+    A background thread writes the records in batches of up to `batch_size` to `path` or `stream`;
+    batches that fail to be written are counted in `errors` and skipped.
+
+    overflow="drop" - records that don't fit into the queue are counted in `dropped` and lost.
+    overflow="block" - the request waits until the flusher frees some room.
+    """
+    _STOP = object()
+    process_affinity = 'pinned'
+
+    def __init__(self, stream: Optional[TextIO] = None, path: Optional[str] = None, max_queue: int = 10_000,
+                 batch_size: int = 512, overflow: str = 'drop', flush_interval: float = 0.1) -> None:
+        if overflow not in ('drop', 'block'):
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        self._owns_stream = path is not None
+        self._stream = open(path, 'a') if path is not None else stream or sys.stdout
+        self._queue: Queue = Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._block = overflow == 'block'
+        self._flush_interval = flush_interval
+        self._counters_lock = Lock()
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._thread = Thread(target=self._drain, name='BufferedLoggingHandler', daemon=True)
+        self._thread.start()
+
+    def check(self, request: dict) -> Optional[str]:
+        record = (time(), repr(request))
+        if self._block:
+            self._queue.put(record)
+        else:
+            try:
+                self._queue.put_nowait(record)
+            except Full:
+                with self._counters_lock:
+                    self.dropped += 1
+        return None
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        return {'queue_depth': self.queue_depth, 'dropped': self.dropped, 'written': self.written,
+                'errors': self.errors}
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def close(self) -> None:
+        self._queue.put(self._STOP)
+        self._thread.join()
+        if self._owns_stream:
+            self._stream.close()
+
+    @staticmethod
+    def format_record(timestamp: float, request: str) -> str:
+        return f"{datetime.fromtimestamp(timestamp).isoformat(sep=' ')} LoggingHandler: Logging request: {request}\n"
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self._flush_interval)]
+            except Empty:
+                continue
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Empty:
+                    break
+
+            stop = self._STOP in batch
+            records = [record for record in batch if record is not self._STOP]
+            try:
+                if records:
+                    self._stream.write("".join(self.format_record(*record) for record in records))
+                    self._stream.flush()
+                    with self._counters_lock:
+                        self.written += len(records)
+            except Exception:
+                with self._counters_lock:
+                    self.errors += len(records)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
 
 
 class ErrorHandler(AbstractHandler):
-    def handle(self, request: dict) -> Optional[str]:
-        return "ErrorHandler: Error occurred during processing"
+    message = "ErrorHandler: Error occurred during processing"
+
+    def check(self, request: dict) -> Optional[str]:
+        return self.message
+
+    def reject_mask(self, columns: Dict[str, Sequence], size: int) -> Optional[np.ndarray]:
+        return np.ones(size, dtype=bool)
+
+
+_worker_segments: Optional[List[List[Callable[[Any], Optional[str]]]]] = None
+
+
+def _init_chain_worker(segments: List[List[AbstractHandler]]) -> None:
+    global _worker_segments
+    _worker_segments = [[handler.check for handler in segment] for segment in segments]
+
+
+def _run_chain_segment(segment_index: int, requests: List[Any]) -> List[Optional[str]]:
+    checks = _worker_segments[segment_index]
+    results = []
+    for request in requests:
+        result = None
+        for check in checks:
+            result = check(request)
+            if result is not None:
+                break
+        results.append(result)
+    return results
+
+
+class ChainExecutor:
+    """
+    Runs a chain over a process pool, in `chunk_size` chunks of requests, and returns results in input order.
+
+    The chain is split into segments of adjacent handlers with the same `process_affinity`.
+    'worker' segments are copied into every worker once, 'pinned' ones (shared state such as
+    RateLimitHandler) run in the parent process and see the requests in their original order.
+    Handlers that override `handle` themselves end the chain and run in the parent too.
+    """
+
+    def __init__(self, head: Handler, processes: Optional[int] = None, chunk_size: int = 1000) -> None:
+        self._segments: List[Tuple[bool, List[AbstractHandler]]] = []
+        self._tail = None
+        handler = head
+        while handler is not None:
+            if not isinstance(handler, AbstractHandler) or type(handler).handle is not AbstractHandler.handle:
+                self._tail = handler.handle
+                break
+            pinned = handler.process_affinity == 'pinned'
+            if not self._segments or self._segments[-1][0] != pinned:
+                self._segments.append((pinned, []))
+            self._segments[-1][1].append(handler)
+            handler = handler._next_handler
+
+        worker_segments = []
+        for pinned, handlers in self._segments:
+            clones = []
+            if not pinned:
+                for original in handlers:
+                    clone = copy.copy(original)
+                    clone._next_handler = None
+                    clones.append(clone)
+            worker_segments.append(clones)
+        self._chunk_size = chunk_size
+        self._pool = ProcessPoolExecutor(processes, initializer=_init_chain_worker, initargs=(worker_segments,))
+
+    def map(self, requests: Iterable[Any]) -> List[Optional[str]]:
+        requests = list(requests)
+        results: List[Optional[str]] = [None] * len(requests)
+        pending = list(range(len(requests)))
+
+        for segment_index, (pinned, handlers) in enumerate(self._segments):
+            if not pending:
+                break
+            if pinned:
+                segment_results = []
+                for i in pending:
+                    result = None
+                    for handler in handlers:
+                        result = handler.check(requests[i])
+                        if result is not None:
+                            break
+                    segment_results.append(result)
+            else:
+                chunks = [pending[start:start + self._chunk_size]
+                          for start in range(0, len(pending), self._chunk_size)]
+                segment_results = []
+                for chunk_results in self._pool.map(_run_chain_segment, [segment_index] * len(chunks),
+                                                    [[requests[i] for i in chunk] for chunk in chunks]):
+                    segment_results.extend(chunk_results)
+
+            still_pending = []
+            for i, result in zip(pending, segment_results):
+                if result is None:
+                    still_pending.append(i)
+                else:
+                    results[i] = result
+            pending = still_pending
+
+        if self._tail is not None:
+            for i in pending:
+                results[i] = self._tail(requests[i])
+        return results
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> ChainExecutor:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class PayloadValidationHandler(AbstractHandler):
+    def __init__(self, rounds: int = 2000) -> None:
+        self.rounds = rounds
+
+    def check(self, request: dict) -> Optional[str]:
+        digest = 0
+        for i in range(self.rounds):  # stands in for signature verification
+            digest = (digest * 31 + i) % 1_000_003
+        if digest < 0 or not request.get('payload', True):
+            return "PayloadValidationHandler: Invalid payload"
+        return None
+
+
+class AsyncHandler(ABC):
+    @abstractmethod
+    def set_next(self, handler: AsyncHandler) -> AsyncHandler:
+        pass
+
+    @abstractmethod
+    async def handle(self, request: Any) -> Optional[str]:
+        pass
+
+
+class AsyncAbstractHandler(AsyncHandler):
+    _next_handler: AsyncHandler = None
+
+    def set_next(self, handler: AsyncHandler) -> AsyncHandler:
+        self._next_handler = handler
+        return handler
+
+    async def handle(self, request: Any) -> Optional[str]:
+        result = await self.check(request)
+        if result is not None:
+            return result
+        if self._next_handler is not None:
+            return await self._next_handler.handle(request)
+        return None
+
+    async def check(self, request: Any) -> Optional[str]:
+        return None
+
+
+class ConcurrentHandler(AsyncAbstractHandler):
+    """
+    Runs the checks of independent handlers concurrently and returns the first rejection in declared order.
+    """
+
+    def __init__(self, *handlers: AsyncAbstractHandler) -> None:
+        self._handlers = handlers
+
+    async def check(self, request: Any) -> Optional[str]:
+        results = await asyncio.gather(*(handler.check(request) for handler in self._handlers))
+        for result in results:
+            if result is not None:
+                return result
+        return None
+
+
+class SyncHandlerBridge(AsyncAbstractHandler):
+    """
+    Puts a synchronous handler, together with the synchronous chain linked after it, into an async chain.
+    Blocking handlers run in `executor` (the loop's default one if None), cheap ones can run inline.
+    """
+
+    def __init__(self, handler: Handler, blocking: bool = True, executor: Optional[Executor] = None) -> None:
+        self._handler = handler
+        self._blocking = blocking
+        self._executor = executor
+        self._call = handler.handle
+
+    async def check(self, request: Any) -> Optional[str]:
+        if not self._blocking:
+            return self._call(request)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, request)
+
+
+class AsyncAuthenticationHandler(AsyncAbstractHandler):
+    def __init__(self, lookup_delay: float = 0.01) -> None:
+        self.lookup_delay = lookup_delay
+
+    async def check(self, request: dict) -> Optional[str]:
+        await asyncio.sleep(self.lookup_delay)  # token lookup
+        if not request.get('authenticated'):
+            return "AuthenticationHandler: Authentication failed"
+        return None
+
+
+class AsyncAuthorizationHandler(AsyncAbstractHandler):
+    def __init__(self, lookup_delay: float = 0.01) -> None:
+        self.lookup_delay = lookup_delay
+
+    async def check(self, request: dict) -> Optional[str]:
+        await asyncio.sleep(self.lookup_delay)  # permissions lookup
+        if not request.get('authorized'):
+            return "AuthorizationHandler: Authorization failed"
+        return None
 
 
 def client_code(handler: Handler) -> None:
@@ -81,6 +908,109 @@ def client_code(handler: Handler) -> None:
             print("  Request processed successfully")
 
 
+class PassHandler(AbstractHandler):
+    def check(self, request: dict) -> Optional[str]:
+        if request.get('blocked'):
+            return "PassHandler: Request blocked"
+        return None
+
+
+def benchmark_compiled_chain(depth: int = 20, requests_count: int = 20_000) -> None:
+    head = PassHandler()
+    handler = head
+    for _ in range(depth - 1):
+        handler = handler.set_next(PassHandler())
+    compiled = head.compile()
+
+    requests = [{'blocked': False} for _ in range(requests_count)]
+    assert [head.handle(request) for request in requests] == compiled.handle_many(requests)
+
+    start = perf_counter()
+    for request in requests:
+        head.handle(request)
+    linked_time = perf_counter() - start
+
+    start = perf_counter()
+    for request in requests:
+        compiled.handle(request)
+    compiled_time = perf_counter() - start
+
+    start = perf_counter()
+    compiled.handle_many(requests)
+    many_time = perf_counter() - start
+
+    print(f"Benchmark: {depth} handlers, {requests_count} requests")
+    print(f"  linked chain:          {linked_time:.4f}s")
+    print(f"  compiled handle:       {compiled_time:.4f}s ({linked_time / compiled_time:.1f}x)")
+    print(f"  compiled handle_many:  {many_time:.4f}s ({linked_time / many_time:.1f}x)")
+
+
+async def async_client_code(handler: AsyncHandler, requests_count: int = 1000) -> None:
+    requests = [{'authenticated': True, 'authorized': i % 4 != 0} for i in range(requests_count)]
+
+    start = perf_counter()
+    results = await asyncio.gather(*(handler.handle(request) for request in requests))
+    elapsed = perf_counter() - start
+
+    rejected = sum(result == "AuthorizationHandler: Authorization failed" for result in results)
+    print(f"Client: {requests_count} requests in flight, {rejected} rejected, took {elapsed:.2f}s")
+
+
+def example_rate_limit():
+    """
+    >>> now = [0.0]
+    >>> limiter = RateLimitHandler(max_requests=10, period=60.0, mode='sliding_window', key='client',
+    ...                            shards=1, clock=lambda: now[0])
+    >>> bool(limiter), limiter.size()
+    (True, 0)
+    >>> sum(limiter.check({'client': 'alice'}) is None for _ in range(10))
+    10
+    >>> now[0] = 60.5  # the previous window still weighs 59.5 / 60 of its 10 requests
+    >>> sum(limiter.check({'client': 'alice'}) is None for _ in range(10))
+    1
+    >>> now[0] = 300.0  # idle for more than 2 periods: the key is expired and starts over
+    >>> sum(limiter.check({'client': 'bob'}) is None for _ in range(10)), limiter.size()
+    (10, 1)
+    >>> limiter = RateLimitHandler(max_requests=1, key='client', shards=1, max_keys=2)
+    >>> [limiter.check({'client': client}) is None for client in 'aba']
+    [True, True, False]
+    >>> [limiter.check({'client': client}) is None for client in 'ca']  # c pushes out b, a keeps its state
+    [True, False]
+    """
+
+
+def example_buffered_logging():
+    """
+    >>> from io import StringIO
+    >>> log = StringIO()
+    >>> logging_handler = BufferedLoggingHandler(stream=log)
+    >>> request = {'id': 1}
+    >>> logging_handler.handle(request)
+    >>> request['id'] = 2
+    >>> logging_handler.flush()
+    >>> log.getvalue().endswith("Logging request: {'id': 1}\\n")
+    True
+    >>> log.close()  # writes fail from now on, the flusher keeps going
+    >>> logging_handler.handle({'id': 3})
+    >>> logging_handler.flush()
+    >>> logging_handler.close()
+    >>> logging_handler.stats()
+    {'queue_depth': 0, 'dropped': 0, 'written': 1, 'errors': 1}
+    """
+
+
+def example_sync_bridge():
+    """
+    >>> auth = AuthenticationHandler()
+    >>> _ = auth.set_next(AuthorizationHandler())
+    >>> request = {'authenticated': True, 'authorized': False}
+    >>> auth.handle(request)
+    'AuthorizationHandler: Authorization failed'
+    >>> asyncio.run(SyncHandlerBridge(auth, blocking=False).handle(request))
+    'AuthorizationHandler: Authorization failed'
+    """
+
+
 if __name__ == "__main__":
     auth_handler = AuthenticationHandler()
     authz_handler = AuthorizationHandler()
@@ -119,3 +1049,110 @@ if __name__ == "__main__":
     #
     # Client: Sending request 4: {'authenticated': True, 'authorized': True}
     #   RateLimitHandler: Rate limit exceeded
+
+    print("\n\nCompiled chain: Authentication > Authorization > Rate Limit > Logging > Error")
+    compiled_chain = auth_handler.compile()
+    print(compiled_chain.handle_many([
+        {'authenticated': False, 'authorized': True},
+        {'authenticated': True, 'authorized': False},
+    ]))
+    # ['AuthenticationHandler: Authentication failed', 'AuthorizationHandler: Authorization failed']
+
+    print("\n\nPer-client rate limit: 2 requests per minute for every 'client'")
+    client_limit_handler = RateLimitHandler(max_requests=2, period=60.0, mode='sliding_window', key='client')
+    for client in ['alice', 'alice', 'bob', 'alice']:
+        print(f"  {client}: {client_limit_handler.handle({'client': client}) or 'Request processed successfully'}")
+    #   alice: Request processed successfully
+    #   alice: Request processed successfully
+    #   bob: Request processed successfully
+    #   alice: RateLimitHandler: Rate limit exceeded
+
+    print("\n\nInstrumented chain: Authentication > Authorization > Error")
+    metrics_head = AuthenticationHandler()
+    metrics_head.set_next(AuthorizationHandler()).set_next(ErrorHandler())
+    chain_metrics = metrics_head.instrument()
+    for i in range(1000):
+        metrics_head.handle({'authenticated': i % 10 != 0, 'authorized': i % 2 == 0})
+    for name, handler_stats in chain_metrics.snapshot().items():
+        print(f"  {name}: {handler_stats}")
+    chain_metrics.uninstrument()
+    #   0:AuthenticationHandler: {'calls': 1000, 'rejects': 100, 'passes': 900, 'p50_ns': 255, 'p99_ns': 255, ...}
+    #   1:AuthorizationHandler: {'calls': 900, 'rejects': 500, 'passes': 400, 'p50_ns': 255, 'p99_ns': 511, ...}
+    #   2:ErrorHandler: {'calls': 400, 'rejects': 400, 'passes': 0, 'p50_ns': 255, 'p99_ns': 255, ...}
+
+    print("\n\nAdaptive chain: Authentication > Authorization > Rate Limit > Error, 80% of requests are unauthorized")
+    adaptive_head = AuthenticationHandler()
+    adaptive_head.set_next(AuthorizationHandler()).set_next(RateLimitHandler(max_requests=10_000)) \
+        .set_next(ErrorHandler())
+    adaptive_chain = adaptive_head.adaptive(reorder_every=500)
+    print(f"  before: {' > '.join(adaptive_chain.order)}")
+    adaptive_chain.handle_many({'authenticated': True, 'authorized': i % 5 == 0} for i in range(1000))
+    print(f"  after:  {' > '.join(adaptive_chain.order)}")
+    #   before: AuthenticationHandler > AuthorizationHandler > RateLimitHandler > ErrorHandler
+    #   after:  AuthorizationHandler > AuthenticationHandler > RateLimitHandler > ErrorHandler
+
+    if np is not None:
+        print("\n\nColumnar batch: Authentication > Authorization > Error over 1,000,000 recorded requests")
+        columnar_head = AuthenticationHandler()
+        columnar_head.set_next(AuthorizationHandler()).set_next(ErrorHandler())
+        rng = np.random.default_rng(0)
+        recorded = {'authenticated': rng.random(1_000_000) < 0.9, 'authorized': rng.random(1_000_000) < 0.7}
+        start = perf_counter()
+        result_codes, results = columnar_head.handle_columns(recorded)
+        print(f"  results: {results}")
+        print(f"  codes: {np.bincount(result_codes).tolist()}, took {perf_counter() - start:.3f}s")
+        #   results: [None, 'AuthenticationHandler: Authentication failed', ...]
+        #   codes: [0, 100303, 269795, 629902], took 0.027s
+
+    print("\n\nCached sub-chain: [Authentication > Authorization] > Error")
+    cached_auth = AuthenticationHandler()
+    cached_auth.set_next(AuthorizationHandler())
+    cached_handler = CachedHandler(cached_auth, max_size=1000, ttl=60.0)
+    cached_handler.set_next(ErrorHandler())
+    for i in range(1000):
+        cached_handler.handle({'authenticated': i % 10 != 0, 'authorized': i % 3 != 0, 'id': i})
+    print(f"  {cached_handler.stats()}")
+    #   {'size': 4, 'hits': 996, 'misses': 4, 'evictions': 0}
+
+    print("\n\nProcess pool: Authentication > Payload Validation > Rate Limit (pinned) > Error")
+    pool_head = AuthenticationHandler()
+    pool_head.set_next(PayloadValidationHandler()) \
+        .set_next(RateLimitHandler(max_requests=1000, period=86400.0)).set_next(ErrorHandler())
+    pool_requests = [{'authenticated': True, 'payload': i % 4 != 0} for i in range(2000)]
+    start = perf_counter()
+    sequential_results = [pool_head.handle(request) for request in pool_requests]
+    sequential_time = perf_counter() - start
+    pool_head.set_next(PayloadValidationHandler()) \
+        .set_next(RateLimitHandler(max_requests=1000, period=86400.0)).set_next(ErrorHandler())
+    with ChainExecutor(pool_head, chunk_size=250) as chain_executor:
+        start = perf_counter()
+        pool_results = chain_executor.map(pool_requests)
+        pool_time = perf_counter() - start
+    print(f"  same results: {pool_results == sequential_results}, "
+          f"sequential: {sequential_time:.2f}s, process pool: {pool_time:.2f}s")
+    #   same results: True, sequential: 0.44s, process pool: 0.13s  (4 cores)
+
+    print("\n\nBuffered logging: 1000 requests through Logging > Error, written to a file in the background")
+    buffered_logging_handler = BufferedLoggingHandler(path=os.devnull, max_queue=256, overflow='drop')
+    buffered_logging_handler.set_next(ErrorHandler())
+    for i in range(1000):
+        buffered_logging_handler.handle({'authenticated': True, 'authorized': True, 'id': i})
+    buffered_logging_handler.flush()
+    print(f"  {buffered_logging_handler.stats()}")
+    buffered_logging_handler.close()
+    #   {'queue_depth': 0, 'dropped': 744, 'written': 256, 'errors': 0}
+
+    print("\n\nAsync chain: (Authentication | Authorization) > Rate Limit > Error")
+    async_handler = ConcurrentHandler(AsyncAuthenticationHandler(), AsyncAuthorizationHandler())
+    async_handler.set_next(
+        SyncHandlerBridge(RateLimitHandler(max_requests=10_000), blocking=False)
+    ).set_next(SyncHandlerBridge(ErrorHandler(), blocking=False))
+    asyncio.run(async_client_code(async_handler))
+    # Client: 1000 requests in flight, 250 rejected, took 0.06s
+
+    print()
+    benchmark_compiled_chain()
+    # Benchmark: 20 handlers, 20000 requests
+    #   linked chain:          0.0689s
+    #   compiled handle:       0.0453s (1.5x)
+    #   compiled handle_many:  0.0427s (1.6x)
@@ -1,15 +1,39 @@
 from __future__ import annotations
+import hashlib
+import mmap
+import os
+import sys
 from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import deque
 from datetime import datetime
-from random import sample
+from random import randrange, sample
 from string import ascii_letters
+from tempfile import TemporaryDirectory
+from threading import Lock
+from time import monotonic_ns, perf_counter, time, time_ns
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from weakref import finalize
+
+_WALL_CLOCK_OFFSET_NS = time_ns() - monotonic_ns()
 
 
 class Originator:
     _state = None
 
-    def __init__(self, state: str) -> None:
+    def __init__(self, state: str, keyframe_interval: Optional[int] = None,
+                 snapshot_store: Optional[SnapshotStore] = None) -> None:
+        """
+        With `keyframe_interval` set, snapshots are DeltaMementos with a full copy every `keyframe_interval` saves.
+        With `snapshot_store` set, snapshots are DedupMementos sharing their chunks through the store.
+        """
+        if keyframe_interval is not None and snapshot_store is not None:
+            raise ValueError("Originator: choose either keyframe_interval or snapshot_store")
         self._state = state
+        self._keyframe_interval = keyframe_interval
+        self._snapshot_store = snapshot_store
+        self._last_memento: Optional[DeltaMemento] = None
+        self._last_saved_state: Optional[str] = None
         print(f"Originator: My initial state is: {self._state}")
 
     def do_something(self) -> None:
@@ -22,7 +46,13 @@ class Originator:
         return "".join(sample(ascii_letters, length))
 
     def save(self) -> Memento:
-        return ConcreteMemento(self._state)
+        if self._snapshot_store is not None:
+            return DedupMemento(self._state, self._snapshot_store)
+        if self._keyframe_interval is None:
+            return ConcreteMemento(self._state)
+        memento = DeltaMemento(self._state, self._last_memento, self._last_saved_state, self._keyframe_interval)
+        self._last_memento, self._last_saved_state = memento, self._state
+        return memento
 
     def restore(self, memento: Memento) -> None:
         self._state = memento.get_state()
@@ -30,6 +60,8 @@ class Originator:
 
 
 class Memento(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def get_name(self) -> str:
         pass
@@ -42,48 +74,540 @@ class Memento(ABC):
     def get_state(self) -> str:
         pass
 
+    def get_size(self) -> int:
+        """
+        Approximate number of bytes held by the memento.
+        """
+        return sys.getsizeof(self.get_state())
+
+    def get_keyframe(self) -> Memento:
+        """
+        The memento whose memory this one keeps alive; mementos sharing a keyframe are only freed together.
+        """
+        return self
+
+    @abstractmethod
+    def get_timestamp_ns(self) -> int:
+        pass
+
+    def get_wall_time_ns(self) -> int:
+        return self.get_timestamp_ns() + _WALL_CLOCK_OFFSET_NS
+
+    def get_timestamp(self) -> float:
+        return self.get_wall_time_ns() / 1e9
+
+
+class TimestampedMemento(Memento):
+    """
+    Records its creation as monotonic integer nanoseconds for ordering and as wall-clock nanoseconds for dates,
+    which would drift from the monotonic clock plus a fixed offset; the date and the name are formatted on first use.
+    """
+    __slots__ = ('_created_ns', '_wall_ns', '_name')
+
+    def __init__(self) -> None:
+        self._created_ns = monotonic_ns()
+        self._wall_ns = time_ns()
+        self._name: Optional[str] = None
+
+    def _preview(self) -> str:
+        return self.get_state()[0:9]
+
+    def get_timestamp_ns(self) -> int:
+        return self._created_ns
+
+    def get_wall_time_ns(self) -> int:
+        return self._wall_ns
+
+    def get_date(self) -> str:
+        return str(datetime.fromtimestamp(self.get_timestamp()))[:19]
+
+    def get_name(self) -> str:
+        if self._name is None:
+            self._name = f"{self.get_date()} / ({self._preview()}...)"
+        return self._name
+
+
+class ConcreteMemento(TimestampedMemento):
+    __slots__ = ('_state',)
 
-class ConcreteMemento(Memento):
     def __init__(self, state: str) -> None:
+        super().__init__()
         self._state = state
-        self._date = str(datetime.now())[:19]
 
     def get_state(self) -> str:
         return self._state
 
-    def get_name(self) -> str:
-        return f"{self._date} / ({self._state[0:9]}...)"
+    def get_size(self) -> int:
+        return sys.getsizeof(self._state)
+
+
+class DeltaMemento(TimestampedMemento):
+    """
+    Keeps either the full state (a keyframe) or the edit against the previous memento:
+    state = previous[:start] + inserted + previous[end:].
+    Restoring replays at most `keyframe_interval - 1` edits from the nearest keyframe.
+    """
+    __slots__ = ('_head', '_previous', '_depth', '_state', '_delta')
+
+    def __init__(self, state: str, previous: Optional[DeltaMemento] = None, previous_state: Optional[str] = None,
+                 keyframe_interval: int = 16) -> None:
+        super().__init__()
+        self._head = state[0:9]
+        if previous is None or previous_state is None or previous._depth + 1 >= keyframe_interval:
+            self._previous = None
+            self._depth = 0
+            self._state = state
+            self._delta = None
+        else:
+            self._previous = previous
+            self._depth = previous._depth + 1
+            self._state = None
+            self._delta = self._diff(previous_state, state)
+
+    @staticmethod
+    def _diff(old: str, new: str) -> Tuple[int, int, str]:
+        # binary searches over slice comparisons keep the character loops in C
+        low, high = 0, min(len(old), len(new))
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[:middle] == new[:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        start = low
+
+        low, high = 0, min(len(old), len(new)) - start
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[len(old) - middle:] == new[len(new) - middle:]:
+                low = middle
+            else:
+                high = middle - 1
+        suffix = low
+        return start, len(old) - suffix, new[start:len(new) - suffix]
+
+    def is_keyframe(self) -> bool:
+        return self._delta is None
+
+    def get_keyframe(self) -> Memento:
+        memento = self
+        while memento._previous is not None:
+            memento = memento._previous
+        return memento
+
+    def get_state(self) -> str:
+        deltas = []
+        memento = self
+        while memento._delta is not None:
+            deltas.append(memento._delta)
+            memento = memento._previous
+        state = memento._state
+        for start, end, inserted in reversed(deltas):
+            state = state[:start] + inserted + state[end:]
+        return state
+
+    def _preview(self) -> str:
+        return self._head
+
+    def get_size(self) -> int:
+        if self._delta is None:
+            return sys.getsizeof(self._state)
+        return sys.getsizeof(self._delta) + sys.getsizeof(self._delta[2])
+
+
+class SnapshotStore:
+    """
+    Content-addressed storage of memento states shared by any number of originators.
+    States are cut into `chunk_size`-byte chunks.
+    With `content_defined` they are cut instead where a rolling (gear) hash of the content hits a boundary pattern,
+    into chunks of about `chunk_size` bytes (between a quarter and four times that), so an insertion only changes
+    the chunks around it instead of shifting every chunk after it. The hash runs a Python loop over every byte,
+    which makes `put` about 50 times slower than with fixed-size chunks: worth it only for large states
+    that mostly change by insertions and deletions.
+    Every distinct chunk is kept once with a reference count and is dropped when the last memento using it goes away.
+    """
+    _GEAR = [int.from_bytes(hashlib.blake2b(bytes([byte]), digest_size=8).digest(), 'little') for byte in range(256)]
+
+    def __init__(self, chunk_size: int = 4096, content_defined: bool = False) -> None:
+        self._chunk_size = chunk_size
+        self._content_defined = content_defined
+        self._min_size, self._max_size = max(1, chunk_size // 4), chunk_size * 4
+        bits = max(1, (chunk_size - self._min_size).bit_length() - 1)
+        self._boundary_mask = ((1 << bits) - 1) << (64 - bits)  # the high bits depend on the most bytes
+        self._lock = Lock()
+        self._chunks: Dict[bytes, bytes] = {}
+        self._references: Dict[bytes, int] = {}
+
+    def _split(self, data: bytes) -> Iterator[bytes]:
+        if not self._content_defined:
+            return (data[start:start + self._chunk_size] for start in range(0, len(data), self._chunk_size))
+        return self._split_content_defined(data)
+
+    def _split_content_defined(self, data: bytes) -> Iterator[bytes]:
+        gear, mask = self._GEAR, self._boundary_mask
+        start = 0
+        while len(data) - start > self._min_size:
+            end = min(len(data), start + self._max_size)
+            fingerprint = 0
+            for position in range(start + self._min_size, end):
+                fingerprint = ((fingerprint << 1) + gear[data[position]]) & 0xFFFFFFFFFFFFFFFF
+                if not fingerprint & mask:
+                    end = position + 1
+                    break
+            yield data[start:end]
+            start = end
+        if start < len(data):
+            yield data[start:]
+
+    def put(self, state: str) -> Tuple[bytes, ...]:
+        data = state.encode()
+        digests = []
+        with self._lock:
+            for chunk in self._split(data):
+                digest = hashlib.blake2b(chunk, digest_size=16).digest()
+                if digest in self._references:
+                    self._references[digest] += 1
+                else:
+                    self._chunks[digest] = chunk
+                    self._references[digest] = 1
+                digests.append(digest)
+        return tuple(digests)
+
+    def get(self, digests: Tuple[bytes, ...]) -> str:
+        chunks = self._chunks
+        return b"".join([chunks[digest] for digest in digests]).decode()
+
+    def release(self, digests: Tuple[bytes, ...]) -> None:
+        with self._lock:
+            for digest in digests:
+                self._references[digest] -= 1
+                if not self._references[digest]:
+                    del self._references[digest]
+                    del self._chunks[digest]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'unique_chunks': len(self._chunks),
+                'stored_bytes': sum(len(chunk) for chunk in self._chunks.values()),
+                'references': sum(self._references.values()),
+            }
+
+
+class DedupMemento(TimestampedMemento):
+    """
+    Keeps only the chunk digests of its state; the chunks are released once the memento is garbage collected.
+    """
+    __slots__ = ('_head', '_store', '_digests', '__weakref__')
+
+    def __init__(self, state: str, store: SnapshotStore) -> None:
+        super().__init__()
+        self._head = state[0:9]
+        self._store = store
+        self._digests = store.put(state)
+        finalize(self, store.release, self._digests)
+
+    def get_state(self) -> str:
+        return self._store.get(self._digests)
+
+    def _preview(self) -> str:
+        return self._head
+
+    def get_size(self) -> int:
+        return sys.getsizeof(self._digests) + 16 * len(self._digests)
+
+
+def benchmark_delta_mementos(state_size: int = 100_000, snapshots: int = 200, edit_size: int = 20,
+                             keyframe_interval: int = 16) -> None:
+    state = _random_text(state_size)
+    full, delta = [], []
+    previous, previous_state = None, None
+    for _ in range(snapshots):
+        position = randrange(state_size - edit_size)
+        state = state[:position] + _random_text(edit_size) + state[position + edit_size:]
+        full.append(ConcreteMemento(state))
+        previous = DeltaMemento(state, previous, previous_state, keyframe_interval)
+        previous_state = state
+        delta.append(previous)
+
+    print(f"Benchmark: {snapshots} snapshots of {state_size} characters, {edit_size} changed per snapshot")
+    for name, mementos in (("full copies", full), (f"deltas, keyframe every {keyframe_interval}", delta)):
+        memory = sum(memento.get_size() for memento in mementos) / snapshots
+        start = perf_counter()
+        for memento in mementos:
+            memento.get_state()
+        restore = (perf_counter() - start) / snapshots * 1e6
+        print(f"  {name}: {memory / 1024:.1f} KiB per snapshot, restore {restore:.1f} us")
+    assert [memento.get_state() for memento in full] == [memento.get_state() for memento in delta]
 
-    def get_date(self) -> str:
-        return self._date
+
+def _random_text(length: int) -> str:
+    return "".join(ascii_letters[randrange(len(ascii_letters))] for _ in range(length))
+
+
+class EvictionPolicy(ABC):
+    @abstractmethod
+    def select(self, mementos: Sequence[Memento]) -> int:
+        """
+        Index of the memento to drop, `mementos` go from the oldest to the newest.
+        """
+        pass
+
+
+class OldestFirst(EvictionPolicy):
+    def select(self, mementos: Sequence[Memento]) -> int:
+        return 0
+
+
+class TimeThinning(EvictionPolicy):
+    """
+    `tiers` are (max age, spacing) in seconds: by default every snapshot of the last minute,
+    one per minute of the last hour and one per hour of the last day.
+    Drops the older of two snapshots that fall into the same slot, or the oldest one if there are none.
+    """
+
+    def __init__(self, tiers: Sequence[Tuple[float, float]] = ((60, 0), (3600, 60), (86400, 3600)),
+                 clock: Callable[[], float] = time) -> None:
+        self._tiers = sorted(tiers)
+        self._clock = clock
+
+    def _slot(self, age: float) -> Optional[Tuple[int, int]]:
+        for tier, (max_age, spacing) in enumerate(self._tiers):
+            if age < max_age:
+                return None if not spacing else (tier, int(age // spacing))
+        return len(self._tiers), 0
+
+    def select(self, mementos: Sequence[Memento]) -> int:
+        now = self._clock()
+        slots = [self._slot(now - memento.get_timestamp()) for memento in mementos]
+        for i in range(len(slots) - 1):
+            if slots[i] is not None and slots[i] == slots[i + 1]:
+                return i
+        return 0
 
 
 class Caretaker:
-    def __init__(self, originator: Originator) -> None:
-        self._mementos = []
+    """
+    Evicts whole keyframe groups (a keyframe and the deltas built on it): dropping only some of them
+    would free no memory while the rest still reference it.
+    """
+
+    def __init__(self, originator: Originator, max_snapshots: Optional[int] = None, max_bytes: Optional[int] = None,
+                 policy: Optional[EvictionPolicy] = None) -> None:
+        self._mementos: Deque[Memento] = deque()
+        self._timestamps: List[int] = []  # creation time of every memento in the history, in history order
         self._originator = originator
+        self._max_snapshots = max_snapshots
+        self._max_bytes = max_bytes
+        self._policy = policy or OldestFirst()
+        self._retained_bytes = 0
+        self._evicted = 0
 
     def backup(self) -> None:
         print("\nCaretaker: Saving Originator's state...")
-        self._mementos.append(self._originator.save())
+        memento = self._originator.save()
+        self._mementos.append(memento)
+        self._timestamps.append(memento.get_timestamp_ns())
+        self._retained_bytes += memento.get_size()
+        self._evict()
+
+    def _over_budget(self) -> bool:
+        if self._max_snapshots is not None and len(self._mementos) > self._max_snapshots:
+            return True
+        return self._max_bytes is not None and self._retained_bytes > self._max_bytes
+
+    def _group(self, index: int) -> Tuple[int, int]:
+        keyframe = self._mementos[index].get_keyframe()
+        start, end = index, index + 1
+        while start > 0 and self._mementos[start - 1].get_keyframe() is keyframe:
+            start -= 1
+        while end < len(self._mementos) and self._mementos[end].get_keyframe() is keyframe:
+            end += 1
+        return start, end
+
+    def _evict(self) -> None:
+        while len(self._mementos) > 1 and self._over_budget():
+            start, end = self._group(self._policy.select(self._mementos))
+            if end == len(self._mementos):  # never evict the group of the newest memento
+                start, end = self._group(0)
+                if end == len(self._mementos):
+                    break
+            for _ in range(start, end):
+                memento = self._mementos[start]
+                del self._mementos[start]
+                del self._timestamps[start]
+                self._retained_bytes -= memento.get_size()
+                self._evicted += 1
+
+    def _pop(self) -> Optional[Memento]:
+        if not self._mementos:
+            return None
+        memento = self._mementos.pop()
+        self._timestamps.pop()
+        self._retained_bytes -= memento.get_size()
+        return memento
+
+    def _history(self) -> Iterable[Memento]:
+        return self._mementos
+
+    def _memento_at(self, index: int) -> Memento:
+        return self._mementos[index]
 
     def undo(self) -> None:
-        if not len(self._mementos):
+        while (memento := self._pop()) is not None:
+            print(f"Caretaker: Restoring state to: {memento.get_name()}")
+            try:
+                self._originator.restore(memento)
+            except Exception:
+                continue
             return
 
-        memento = self._mementos.pop()
+    def restore_at(self, timestamp_ns: int) -> bool:
+        """
+        Restores the newest memento created at or before `timestamp_ns` (see `Memento.get_timestamp_ns`),
+        keeping the history as it is. Returns False if there is no such memento.
+        """
+        return self._restore_index(bisect_right(self._timestamps, timestamp_ns) - 1)
+
+    def _restore_index(self, index: int) -> bool:
+        if index < 0:
+            return False
+        memento = self._memento_at(index)
         print(f"Caretaker: Restoring state to: {memento.get_name()}")
-        try:
-            self._originator.restore(memento)
-        except Exception:
-            self.undo()
+        self._originator.restore(memento)
+        return True
+
+    def restore_at_time(self, timestamp: float) -> bool:
+        """
+        Like `restore_at`, for a wall-clock `timestamp` in seconds since the epoch (see `Memento.get_timestamp`).
+        The wall clock may be set back, so this scans the whole history instead of bisecting it.
+        """
+        timestamp_ns = int(timestamp * 1e9)
+        found = -1
+        for index, memento in enumerate(self._history()):
+            if memento.get_wall_time_ns() <= timestamp_ns:
+                found = index
+        return self._restore_index(found)
+
+    def stats(self) -> dict:
+        return {'snapshots': len(self._mementos), 'retained_bytes': self._retained_bytes, 'evicted': self._evicted}
 
     def show_history(self) -> None:
         print("Caretaker: Here's the list of mementos:")
-        for memento in self._mementos:
+        for memento in self._history():
             print(memento.get_name())
 
 
+class _SegmentFile:
+    """
+    Append-only file of memento states, read back through mmap.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._file = open(path, 'w+b')
+        self._size = 0
+        self._map: Optional[mmap.mmap] = None
+
+    def append(self, data: bytes) -> int:
+        offset = self._size
+        self._file.seek(offset)
+        self._file.write(data)
+        self._size += len(data)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self._map is None or len(self._map) < offset + length:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map[offset:offset + length]
+
+    def truncate(self, offset: int) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.truncate(offset)
+        self._size = offset
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class SpilledMemento(TimestampedMemento):
+    """
+    Index entry of a memento whose state lives in a segment file; the state is read only by `get_state`.
+    """
+    __slots__ = ('_segment', '_offset', '_length')
+
+    def __init__(self, memento: Memento, segment: _SegmentFile) -> None:
+        super().__init__()
+        data = memento.get_state().encode()
+        self._created_ns = memento.get_timestamp_ns()
+        self._wall_ns = memento.get_wall_time_ns()
+        self._name = memento.get_name()
+        self._segment = segment
+        self._offset = segment.append(data)
+        self._length = len(data)
+
+    def get_state(self) -> str:
+        return self._segment.read(self._offset, self._length).decode()
+
+    def get_size(self) -> int:
+        return sys.getsizeof(self) + sys.getsizeof(self._name)
+
+
+class SpillingCaretaker(Caretaker):
+    """
+    Keeps the `memory_snapshots` newest mementos in memory and spills older ones to the segment file at `path`,
+    a keyframe group at a time, so the group of the newest memento may stay in memory beyond `memory_snapshots`.
+    Undoing past the in-memory ones reads the states back and truncates the records already undone.
+    """
+
+    def __init__(self, originator: Originator, path: str, memory_snapshots: int = 16) -> None:
+        super().__init__(originator)
+        self._memory_snapshots = memory_snapshots
+        self._segment = _SegmentFile(path)
+        self._spilled: List[SpilledMemento] = []
+
+    def _evict(self) -> None:
+        while len(self._mementos) > self._memory_snapshots:
+            _, end = self._group(0)
+            if end == len(self._mementos):
+                break
+            for _ in range(end):
+                memento = self._mementos.popleft()
+                self._retained_bytes -= memento.get_size()
+                self._spilled.append(SpilledMemento(memento, self._segment))
+
+    def _pop(self) -> Optional[Memento]:
+        if self._mementos:
+            return super()._pop()
+        if not self._spilled:
+            return None
+        memento = self._spilled.pop()
+        self._timestamps.pop()
+        self._segment.truncate(memento._offset + memento._length)
+        return memento
+
+    def _history(self) -> Iterable[Memento]:
+        yield from self._spilled
+        yield from self._mementos
+
+    def _memento_at(self, index: int) -> Memento:
+        if index < len(self._spilled):
+            return self._spilled[index]
+        return self._mementos[index - len(self._spilled)]
+
+    def stats(self) -> dict:
+        return {**super().stats(), 'spilled': len(self._spilled)}
+
+    def close(self) -> None:
+        self._segment.close()
+
+
 if __name__ == "__main__":
     originator = Originator("Super")  # Originator: My initial state is: Super
     caretaker = Caretaker(originator)
@@ -113,3 +637,69 @@ if __name__ == "__main__":
     print("\nClient: Once more!\n")
     caretaker.undo()  # Caretaker: Restoring state to: 2025-01-01 18:47:56 / (fFTNvIKsS...)
     # Originator: My state has changed to: fFTNvIKsSyHlcJRqeijaAzoCZbQwXu
+
+    print("\nClient: A caretaker that keeps at most 2 snapshots\n")
+    bounded_caretaker = Caretaker(originator, max_snapshots=2)
+    for _ in range(3):
+        bounded_caretaker.backup()
+        originator.do_something()
+    print(bounded_caretaker.stats())  # {'snapshots': 2, 'retained_bytes': 158, 'evicted': 1}
+
+    print("\nClient: Delta snapshots leave together with the keyframe they are built on\n")
+    delta_originator = Originator("Super", keyframe_interval=4)
+    delta_caretaker = Caretaker(delta_originator, max_snapshots=6)
+    for _ in range(7):
+        delta_caretaker.backup()
+        delta_originator.do_something()
+    print(delta_caretaker.stats())  # {'snapshots': 3, 'retained_bytes': 364, 'evicted': 4}
+
+    print("\nClient: A caretaker that keeps 1 snapshot in memory and spills the rest to disk\n")
+    spill_directory = TemporaryDirectory()
+    spilling_caretaker = SpillingCaretaker(originator, os.path.join(spill_directory.name, 'mementos.seg'),
+                                           memory_snapshots=1)
+    for _ in range(3):
+        spilling_caretaker.backup()
+        originator.do_something()
+    print(spilling_caretaker.stats())  # {'snapshots': 1, 'retained_bytes': 79, 'evicted': 0, 'spilled': 2}
+    spilling_caretaker.show_history()
+    for _ in range(3):
+        spilling_caretaker.undo()
+    spilling_caretaker.close()
+    spill_directory.cleanup()
+
+    print("\nClient: 3 originators with the same state share their snapshots\n")
+    snapshot_store = SnapshotStore(chunk_size=8)
+    shared_originators = [Originator("Shared state of a big document", snapshot_store=snapshot_store)
+                          for _ in range(3)]
+    shared_caretakers = [Caretaker(shared_originator) for shared_originator in shared_originators]
+    for shared_caretaker in shared_caretakers:
+        shared_caretaker.backup()
+    print(snapshot_store.stats())  # {'unique_chunks': 4, 'stored_bytes': 30, 'references': 12}
+    for shared_caretaker in shared_caretakers:
+        shared_caretaker.undo()
+    print(snapshot_store.stats())  # {'unique_chunks': 0, 'stored_bytes': 0, 'references': 0}
+
+    print("\nClient: Content-defined chunks survive an insertion at the start of a big state\n")
+    document = _random_text(100_000)
+    for content_defined in (False, True):
+        chunk_store = SnapshotStore(content_defined=content_defined)
+        chunk_store.put(document)
+        chunk_store.put("Preface" + document)
+        print(f"content_defined={content_defined}: {chunk_store.stats()['unique_chunks']} unique chunks")
+    # content_defined=False: 50 unique chunks
+    # content_defined=True: 32 unique chunks (about 25 of the first state plus the few around the insertion)
+
+    print("\nClient: Restore the state as of the second backup\n")
+    timed_caretaker = Caretaker(originator)
+    backup_times = []
+    for _ in range(3):
+        timed_caretaker.backup()
+        backup_times.append(monotonic_ns())
+        originator.do_something()
+    timed_caretaker.restore_at(backup_times[1])  # Caretaker: Restoring state to: 2025-01-01 18:47:56 / (uNklOBKvw...)
+    timed_caretaker.restore_at_time(time())  # Caretaker: Restoring state to: 2025-01-01 18:47:56 / (cmHavCArl...)
+
+    print()
+    benchmark_delta_mementos()  # Benchmark: 200 snapshots of 100000 characters, 20 changed per snapshot
+    #   full copies: 97.7 KiB per snapshot, restore 0.1 us
+    #   deltas, keyframe every 16: 6.5 KiB per snapshot, restore 66.3 us
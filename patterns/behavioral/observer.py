@@ -1,12 +1,26 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
+import mmap
+import os
+import pickle
+import struct
+import sys
 from abc import ABC, abstractmethod
-from typing import List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import parent_process, resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from threading import Condition, Lock, RLock, Timer
+from time import monotonic, sleep
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from weakref import WeakValueDictionary, ref
 
 
 class Subject(ABC):
     @abstractmethod
-    def attach(self, observer: Observer) -> None:
+    def attach(self, observer: Observer, topics: Optional[Iterable[Hashable]] = None, **attributes: Any) -> None:
         pass
 
     @abstractmethod
@@ -23,28 +37,648 @@ class Observer(ABC):
     def update(self, subject: Subject) -> None:
         pass
 
+    def update_batch(self, subject: Subject, events: List[Any]) -> None:
+        self.update(subject)
+
+
+class _Mailbox:
+    __slots__ = ('events', 'scheduled', 'delivered', 'dropped', 'errors', 'finalizer')
+
+    def __init__(self) -> None:
+        self.events: deque = deque()  # (enqueued at, subject, batch of events or None)
+        self.scheduled = False
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.finalizer: Optional[ref] = None  # drops the mailbox once its observer is gone
+
+
+class NotificationDispatcher:
+    """
+    Delivers `update` calls through per-observer queues of `queue_size` events,
+    drained by a pool of `max_workers` threads or, if `loop` is given, by tasks on that asyncio loop
+    (`update` may then return an awaitable). `publish_batch` queues `update_batch` calls the same way.
+
+    ordered=True - events reach every observer one at a time in publishing order.
+    ordered=False - events of one observer may be delivered concurrently.
+
+    overflow="block" - the publisher waits for room in the observer's queue.
+    overflow="drop_oldest" / "drop_newest" - the oldest queued / the new event is dropped.
+
+    On the loop's own thread blocking would stop the very tasks it waits for, so there
+    `publish` raises RuntimeError instead of waiting and `flush` always does;
+    use `await publish_async(...)` and `await flush_async()` there.
+    """
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+    _EMPTY = object()
+
+    def __init__(self, max_workers: int = 4, queue_size: int = 1024, overflow: str = 'block',
+                 ordered: bool = True, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        self._queue_size = queue_size
+        self._overflow = overflow
+        self._ordered = ordered
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='notify') if loop is None else None
+        self._lock = Lock()
+        self._changed = Condition(self._lock)
+        # id(observer) -> mailbox, so observers need not be hashable and equal ones don't share a mailbox
+        self._mailboxes: Dict[int, _Mailbox] = {}
+        self._in_flight = 0
+
+    def publish(self, subject: Subject, observers: List[Observer]) -> None:
+        for observer in observers:
+            self._enqueue(observer, subject)
+
+    def publish_batch(self, subject: Subject, batches: List[Tuple[Observer, List[Any]]]) -> None:
+        for observer, events in batches:
+            self._enqueue(observer, subject, events)
+
+    async def publish_async(self, subject: Subject, observers: List[Observer]) -> None:
+        for observer in observers:
+            while self._overflow == 'block' and self._is_full(observer):
+                await asyncio.sleep(0.001)
+            self._enqueue(observer, subject)
+
+    def _on_loop_thread(self) -> bool:
+        if self._loop is None:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _is_full(self, observer: Observer) -> bool:
+        with self._lock:
+            mailbox = self._mailboxes.get(id(observer))
+            return mailbox is not None and len(mailbox.events) >= self._queue_size
+
+    def _new_mailbox(self, observer: Observer) -> _Mailbox:
+        mailbox = _Mailbox()
+        key, dispatcher = id(observer), ref(self)
+
+        def forget(_: ref) -> None:
+            # may run inside the dispatcher's lock (a collection triggered there), so it doesn't take it;
+            # a dict lookup and pop are atomic on their own
+            alive = dispatcher()
+            if alive is not None and alive._mailboxes.get(key) is mailbox:
+                alive._mailboxes.pop(key, None)
+
+        mailbox.finalizer = ref(observer, forget)
+        return mailbox
+
+    def _enqueue(self, observer: Observer, subject: Subject, events: Optional[List[Any]] = None) -> None:
+        with self._lock:
+            mailbox = self._mailboxes.get(id(observer))
+            if mailbox is None:
+                mailbox = self._mailboxes[id(observer)] = self._new_mailbox(observer)
+            if len(mailbox.events) >= self._queue_size:
+                if self._overflow == 'drop_newest':
+                    mailbox.dropped += 1
+                    return
+                if self._overflow == 'drop_oldest':
+                    mailbox.events.popleft()
+                    mailbox.dropped += 1
+                    self._in_flight -= 1
+                else:
+                    if self._on_loop_thread():
+                        raise RuntimeError("NotificationDispatcher: can't block on the loop thread, "
+                                           "use await publish_async()")
+                    while len(mailbox.events) >= self._queue_size:
+                        self._changed.wait()
+            mailbox.events.append((monotonic(), subject, events))
+            self._in_flight += 1
+            schedule = not (self._ordered and mailbox.scheduled)
+            mailbox.scheduled = True
+        if schedule:
+            if self._loop is None:
+                self._executor.submit(self._drain, observer, mailbox)
+            else:
+                asyncio.run_coroutine_threadsafe(self._drain_async(observer, mailbox), self._loop)
+
+    def _next_event(self, mailbox: _Mailbox) -> object:
+        with self._lock:
+            if not mailbox.events:
+                mailbox.scheduled = False
+                return self._EMPTY
+            _, subject, events = mailbox.events.popleft()
+            self._changed.notify_all()
+            return subject, events
+
+    def _done(self, mailbox: _Mailbox, failed: bool) -> None:
+        with self._lock:
+            mailbox.delivered += 1
+            mailbox.errors += failed
+            self._in_flight -= 1
+            self._changed.notify_all()
+
+    def _drain(self, observer: Observer, mailbox: _Mailbox) -> None:
+        while (event := self._next_event(mailbox)) is not self._EMPTY:
+            subject, events = event
+            try:
+                if events is None:
+                    observer.update(subject)
+                else:
+                    observer.update_batch(subject, events)
+            except Exception:
+                self._done(mailbox, True)
+            else:
+                self._done(mailbox, False)
+            if not self._ordered:
+                break
+
+    async def _drain_async(self, observer: Observer, mailbox: _Mailbox) -> None:
+        while (event := self._next_event(mailbox)) is not self._EMPTY:
+            subject, events = event
+            try:
+                result = observer.update(subject) if events is None else observer.update_batch(subject, events)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                self._done(mailbox, True)
+            else:
+                self._done(mailbox, False)
+            if not self._ordered:
+                break
+
+    def lag(self, observer: Observer) -> Dict[str, float]:
+        with self._lock:
+            mailbox = self._mailboxes.get(id(observer)) or _Mailbox()
+            oldest = mailbox.events[0][0] if mailbox.events else None
+            return {
+                'pending': len(mailbox.events),
+                'delivered': mailbox.delivered,
+                'dropped': mailbox.dropped,
+                'errors': mailbox.errors,
+                'lag_seconds': monotonic() - oldest if oldest is not None else 0.0,
+            }
+
+    def flush(self) -> None:
+        if self._on_loop_thread():
+            raise RuntimeError("NotificationDispatcher: can't block on the loop thread, use await flush_async()")
+        with self._lock:
+            while self._in_flight:
+                self._changed.wait()
+
+    async def flush_async(self) -> None:
+        while self._in_flight:
+            await asyncio.sleep(0.001)
+
+    def close(self) -> None:
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+
+class EventCoalescer:
+    """
+    Collects events and hands them to the subject's `notify_batch` once `max_events` are collected
+    or `max_delay` seconds after the first event of the window, whichever comes first.
+    A delayed batch is delivered on the timer's thread (unless the subject has a dispatcher); batches are
+    delivered one at a time and in order, whichever thread flushes them.
+    """
+
+    def __init__(self, max_events: int = 1000, max_delay: Optional[float] = 0.05) -> None:
+        self._max_events = max_events
+        self._max_delay = max_delay
+        self._lock = Lock()
+        # held while a batch is delivered; reentrant, so an observer may publish from update_batch
+        self._flush_lock = RLock()
+        self._events: List[Any] = []
+        self._timer: Optional[Timer] = None
+
+    def add(self, subject: Store, event: Any) -> None:
+        with self._lock:
+            self._events.append(event)
+            full = len(self._events) >= self._max_events
+            if not full and self._timer is None and self._max_delay is not None:
+                self._timer = Timer(self._max_delay, self.flush, args=(subject,))
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush(subject)
+
+    def flush(self, subject: Store) -> None:
+        with self._flush_lock:
+            with self._lock:
+                events, self._events = self._events, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if events:
+                subject.notify_batch(events)
+
+
+class EventLog:
+    """
+    Append-only file of length-prefixed pickled events. Offsets are byte positions in the file.
+    `replay` maps the file and yields the events in batches without reading it into memory.
+    A record cut short by a crash is truncated away when the log is opened again.
+
+    sync="none" - appends stay in the process' buffer until `flush` (lost if the process crashes).
+    sync="flush" - every append is handed to the OS (survives a process crash).
+    sync="fsync" - every append is also forced to the disk (survives a power loss).
+    """
+    LENGTH = struct.Struct('<I')
+    SYNC_POLICIES = ('none', 'flush', 'fsync')
+
+    def __init__(self, path: str, sync: str = 'flush') -> None:
+        if sync not in self.SYNC_POLICIES:
+            raise ValueError(f"sync must be one of {self.SYNC_POLICIES}")
+        self._path = path
+        self._sync = sync
+        self._truncate_torn_tail()
+        self._file = open(path, 'ab')
+
+    def _truncate_torn_tail(self) -> None:
+        try:
+            file = open(self._path, 'rb')
+        except FileNotFoundError:
+            return
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            end = 0
+            while end + self.LENGTH.size <= size:
+                (length,) = self.LENGTH.unpack(file.read(self.LENGTH.size))
+                if end + self.LENGTH.size + length > size:
+                    break
+                end += self.LENGTH.size + length
+                file.seek(end)
+        if end < size:
+            os.truncate(self._path, end)
+
+    def append(self, event: Any) -> int:
+        offset = self._file.tell()
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        self._file.write(self.LENGTH.pack(len(payload)) + payload)
+        if self._sync != 'none':
+            self.flush()
+        return offset
+
+    def flush(self) -> None:
+        self._file.flush()
+        if self._sync == 'fsync':
+            os.fsync(self._file.fileno())
+
+    @property
+    def size(self) -> int:
+        return self._file.tell()
+
+    def replay(self, offset: int = 0, batch_size: int = 1024) -> Iterator[Tuple[int, List[Any]]]:
+        """
+        Yields (offset after the batch, events) for the events logged from `offset` on.
+        """
+        self.flush()
+        with open(self._path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if offset >= size:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                if hasattr(view, 'madvise'):
+                    view.madvise(mmap.MADV_SEQUENTIAL)
+                length_size = self.LENGTH.size
+                while offset + length_size <= size:
+                    events = []
+                    while len(events) < batch_size and offset + length_size <= size:
+                        (length,) = self.LENGTH.unpack_from(view, offset)
+                        end = offset + length_size + length
+                        if end > size:
+                            break
+                        events.append(pickle.loads(view[offset + length_size:end]))
+                        offset = end
+                    if not events:
+                        return
+                    yield offset, events
+
+    def close(self) -> None:
+        self._file.close()
+
 
 class Store(Subject):
-    _observers: List[Observer] = []
+    """
+    Observers attached without `topics` and `attributes` get every event.
+    attach(observer, topics=[...]) - only books of these categories.
+    attach(observer, author=...) - only books whose fields equal all the given values.
+    attach(observer, topics=[...], author=...) - only books matching both.
+    Subscriptions are indexed, so an event only visits the observers interested in it.
+    """
+    _MISSING = object()
+
+    def __init__(self, dispatcher: Optional[NotificationDispatcher] = None,
+                 coalescer: Optional[EventCoalescer] = None, event_log: Optional[EventLog] = None) -> None:
+        # id -> observer; weak references, dead observers drop out by themselves
+        self._observers: WeakValueDictionary[int, Observer] = WeakValueDictionary()
+        self._broadcast: WeakValueDictionary[int, Observer] = WeakValueDictionary()
+        self._topics: Dict[Hashable, WeakValueDictionary[int, Observer]] = {}
+        # (field, value) of the first filter of a subscription without topics -> observers
+        self._attributes: Dict[Tuple[str, Hashable], WeakValueDictionary[int, Observer]] = {}
+        # id -> (topics, attributes); like the indexes keyed by id, so observers need not be hashable
+        self._subscriptions: Dict[int, Tuple[Tuple[Hashable, ...], Dict[str, Any]]] = {}
+        # id -> weak reference whose callback drops the subscription of a dead observer
+        self._finalizers: Dict[int, ref] = {}
+        self._dispatcher = dispatcher
+        self._coalescer = coalescer
+        self._event_log = event_log
+
+    def attach(self, observer: Observer, topics: Optional[Iterable[Hashable]] = None, **attributes: Any) -> None:
+        key = id(observer)
+        topics = tuple(topics or ())
+        buckets = self._buckets(topics, attributes)
+        for _, bucket_key in buckets:
+            hash(bucket_key)  # fail before anything is registered
+        store = ref(self)
 
-    def attach(self, observer: Observer) -> None:
+        def prune(_: ref) -> None:
+            if (alive := store()) is not None and alive._finalizers.pop(key, None) is not None:
+                alive._subscriptions.pop(key, None)
+                alive._drop(key, buckets)
+
+        finalizer = ref(observer, prune)
         print("Subject: Attached an observer.")
-        self._observers.append(observer)
+        if key in self._observers:
+            self._unindex(observer)
+        self._observers[key] = observer
+        self._subscriptions[key] = (topics, attributes)
+        for index, bucket_key in buckets:
+            index.setdefault(bucket_key, WeakValueDictionary())[key] = observer
+        if not buckets:
+            self._broadcast[key] = observer
+        self._finalizers[key] = finalizer
+
+    def attach_from(self, observer: Observer, offset: int = 0, batch_size: int = 1024,
+                    topics: Optional[Iterable[Hashable]] = None, **attributes: Any) -> int:
+        """
+        Replays the logged events from `offset` that match `topics` and `attributes`
+        to `observer.update_batch`, then attaches it for live events.
+        Returns the offset of the log at which live delivery starts.
+        """
+        if self._event_log is None:
+            raise ValueError("Subject: Store has no event log to replay.")
+        topics = tuple(topics or ())
+        for offset, events in self._event_log.replay(offset, batch_size):
+            if topics or attributes:
+                events = [event for event in events if self._matches((topics, attributes), event)]
+            if events:
+                observer.update_batch(self, events)
+        self.attach(observer, topics, **attributes)
+        return self._event_log.size
 
     def detach(self, observer: Observer) -> None:
-        self._observers.remove(observer)
+        if self._observers.pop(id(observer), None) is None:
+            raise ValueError("Subject: Observer is not attached.")
+        self._unindex(observer)
 
-    def notify(self) -> None:
-        for observer in self._observers:
+    def _buckets(self, topics: Tuple[Hashable, ...], attributes: Dict[str, Any]) -> List[Tuple[Dict, Hashable]]:
+        if topics:
+            return [(self._topics, topic) for topic in topics]
+        if attributes:
+            return [(self._attributes, next(iter(attributes.items())))]
+        return []
+
+    def _unindex(self, observer: Observer) -> None:
+        key = id(observer)
+        topics, attributes = self._subscriptions.pop(key, ((), {}))
+        self._finalizers.pop(key, None)
+        self._drop(key, self._buckets(topics, attributes))
+
+    def _drop(self, key: int, buckets: List[Tuple[Dict, Hashable]]) -> None:
+        self._broadcast.pop(key, None)
+        for index, bucket_key in buckets:
+            bucket = index.get(bucket_key)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del index[bucket_key]
+
+    def _matches(self, subscription: Tuple[Tuple[Hashable, ...], Dict[str, Any]], book: Any) -> bool:
+        topics, attributes = subscription
+        if topics and self._topic_of(book) not in topics:
+            return False
+        if attributes and not isinstance(book, dict):
+            return False
+        return all(book.get(field, self._MISSING) == value for field, value in attributes.items())
+
+    @staticmethod
+    def _topic_of(book: Any) -> Optional[Hashable]:
+        return book.get('category') if isinstance(book, dict) else None
+
+    def _recipients(self, book: Any = None) -> List[Observer]:
+        if not self._topics and not self._attributes:
+            return list(self._broadcast.values())
+
+        recipients = dict(self._broadcast.items())
+        buckets = []
+        topic = self._topic_of(book)
+        if topic is not None and topic in self._topics:
+            buckets.append(self._topics[topic])
+        if isinstance(book, dict) and self._attributes:
+            for item in book.items():
+                try:
+                    bucket = self._attributes.get(item)
+                except TypeError:  # unhashable value
+                    continue
+                if bucket is not None:
+                    buckets.append(bucket)
+        for bucket in buckets:
+            for key, observer in list(bucket.items()):
+                if self._matches(self._subscriptions.get(key, ((), {})), book):
+                    recipients[key] = observer
+        return list(recipients.values())
+
+    def notify(self, book: Any = None) -> None:
+        recipients = self._recipients(book)
+        if self._dispatcher is not None:
+            self._dispatcher.publish(self, recipients)
+            return
+        for observer in recipients:
             observer.update(self)
 
-    def buy_new_books(self) -> None:
-        self.notify()
+    def notify_batch(self, events: List[Any]) -> None:
+        if not self._topics and not self._attributes:
+            batches = [(observer, events) for observer in list(self._broadcast.values())]
+        else:
+            by_observer: Dict[int, Tuple[Observer, List[Any]]] = {}
+            for event in events:
+                for observer in self._recipients(event):
+                    by_observer.setdefault(id(observer), (observer, []))[1].append(event)
+            batches = list(by_observer.values())
+        if self._dispatcher is not None:
+            self._dispatcher.publish_batch(self, batches)
+            return
+        for observer, observer_events in batches:
+            observer.update_batch(self, observer_events)
+
+    def buy_new_books(self, book: Any = None) -> None:
+        if self._event_log is not None:
+            self._event_log.append(book)
+        if self._coalescer is not None:
+            self._coalescer.add(self, book)
+            return
+        self.notify(book)
 
     def __repr__(self):
         return f"Store [Observers: {len(self._observers)}]"
 
 
+class SharedMemorySubject(Subject):
+    """
+    Publishes pickled events into a single-producer/multi-consumer ring buffer in shared memory.
+    Layout: header (write cursor, reserve cursor, oldest record, capacity), then `capacity` bytes of
+    records (4-byte length + payload) which wrap around the end of the buffer.
+    Cursors count the bytes ever written. The reserve cursor moves past a record before it is written
+    and the write cursor after, so readers can tell what they copied from what was being overwritten;
+    the oldest record is the start of the earliest record still in the buffer.
+    Header fields are updated with single aligned 8-byte stores (`struct.pack_into` zero-fills first,
+    so readers could see a cursor go back to 0).
+    Consumers in other processes read it with `RemoteObserver`; local observers are notified directly.
+    """
+    HEADER = struct.Struct('<QQQQ')
+    LENGTH = struct.Struct('<I')
+    WRITE, RESERVE, OLDEST, CAPACITY = range(4)  # indices of the header fields
+    _created: set = set()  # names of the segments created by this process
+
+    def __init__(self, name: Optional[str] = None, capacity: int = 1 << 20) -> None:
+        self._shm = SharedMemory(name=name, create=True, size=self.HEADER.size + capacity)
+        self._created.add(self._shm.name)
+        self._capacity = capacity
+        self._cursor = 0
+        self._records: deque = deque()  # starts of the records in the buffer
+        self.HEADER.pack_into(self._shm.buf, 0, 0, 0, 0, capacity)
+        self._header = self._shm.buf[:self.HEADER.size].cast('Q')
+        self._observers: WeakValueDictionary[int, Observer] = WeakValueDictionary()
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def attach(self, observer: Observer, topics: Optional[Iterable[Hashable]] = None, **attributes: Any) -> None:
+        self._observers[id(observer)] = observer
+
+    def detach(self, observer: Observer) -> None:
+        if self._observers.pop(id(observer), None) is None:
+            raise ValueError("Subject: Observer is not attached.")
+
+    def notify(self, event: Any = None) -> None:
+        self.publish(event)
+        for observer in list(self._observers.values()):
+            observer.update(self)
+
+    def publish(self, event: Any) -> None:
+        payload = pickle.dumps(event, protocol=pickle.HIGHEST_PROTOCOL)
+        record = self.LENGTH.pack(len(payload)) + payload
+        if len(record) > self._capacity:
+            raise ValueError(f"Event of {len(record)} bytes doesn't fit into the ring buffer")
+        reserve = self._cursor + len(record)
+        while self._records and self._records[0] < reserve - self._capacity:
+            self._records.popleft()
+        self._records.append(self._cursor)
+        self._header[self.OLDEST] = self._records[0]
+        self._header[self.RESERVE] = reserve  # announce the bytes about to be overwritten
+
+        position = self._cursor % self._capacity
+        first = min(len(record), self._capacity - position)
+        data = self.HEADER.size
+        buf = self._shm.buf
+        buf[data + position:data + position + first] = record[:first]
+        if first < len(record):
+            buf[data:data + len(record) - first] = record[first:]
+        self._cursor = reserve
+        self._header[self.WRITE] = self._cursor  # publish only after the record is written
+
+    def close(self) -> None:
+        self._header.release()
+        self._shm.close()
+        self._shm.unlink()
+        self._created.discard(self._shm.name)
+
+
+class RemoteObserver:
+    """
+    Reads events of a `SharedMemorySubject` by its name, usually from another process.
+    Every consumer keeps its own read cursor and catches up in batches with `poll()`,
+    starting with the next event or, with `from_start`, with the oldest event still in the buffer.
+    A consumer that falls behind by more than the buffer capacity skips to the newest data
+    and counts an overrun.
+    The segment stays owned by the subject: a consumer never unlinks it, not even through
+    the resource tracker of its process when it exits.
+    """
+
+    def __init__(self, name: str, observer: Observer, from_start: bool = False) -> None:
+        self._shm = self._attach(name)
+        self._observer = observer
+        self._header = self._shm.buf[:SharedMemorySubject.HEADER.size].cast('Q')
+        self._capacity = self._header[SharedMemorySubject.CAPACITY]
+        self._cursor = self._header[SharedMemorySubject.OLDEST if from_start else SharedMemorySubject.WRITE]
+        self.overruns = 0
+
+    @staticmethod
+    def _attach(name: str) -> SharedMemory:
+        if sys.version_info >= (3, 13):
+            return SharedMemory(name=name, track=False)
+        shm = SharedMemory(name=name)
+        # before 3.13 attaching registers the segment with this process' resource tracker, which unlinks
+        # it at exit; processes started by multiprocessing share the tracker of their parent instead
+        if os.name == 'posix' and shm.name not in SharedMemorySubject._created and parent_process() is None:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def _overrun(self) -> List[Any]:
+        self.overruns += 1
+        self._cursor = self._header[SharedMemorySubject.WRITE]
+        return []
+
+    def read(self, max_events: Optional[int] = None) -> List[Any]:
+        write_cursor = self._header[SharedMemorySubject.WRITE]
+        if self._header[SharedMemorySubject.RESERVE] - self._cursor > self._capacity:
+            return self._overrun()
+        available = write_cursor - self._cursor
+        if not available:
+            return []
+
+        position = self._cursor % self._capacity
+        first = min(available, self._capacity - position)
+        data = SharedMemorySubject.HEADER.size
+        chunk = bytes(self._shm.buf[data + position:data + position + first])
+        if first < available:
+            chunk += bytes(self._shm.buf[data:data + available - first])
+        if self._header[SharedMemorySubject.RESERVE] - self._cursor > self._capacity:  # overwritten while copying
+            return self._overrun()
+
+        events = []
+        offset = 0
+        length_size = SharedMemorySubject.LENGTH.size
+        while offset < available and (max_events is None or len(events) < max_events):
+            (length,) = SharedMemorySubject.LENGTH.unpack_from(chunk, offset)
+            events.append(pickle.loads(chunk[offset + length_size:offset + length_size + length]))
+            offset += length_size + length
+        self._cursor += offset
+        return events
+
+    def poll(self, max_events: Optional[int] = None) -> int:
+        events = self.read(max_events)
+        if events:
+            self._observer.update_batch(self, events)
+        return len(events)
+
+    def close(self) -> None:
+        self._header.release()
+        self._shm.close()
+
+
+def _read_remotely(name: str, published: Any, results: Any) -> None:
+    remote = RemoteObserver(name, None, from_start=True)
+    received: List[int] = []
+    while True:
+        finished = published.is_set()
+        events = remote.read()
+        received.extend(events)
+        if finished and not events:
+            break
+    remote.close()
+    results.put((received, remote.overruns))
+
+
 class Man(Observer):
     def update(self, subject: Subject) -> None:
         print("Man: Reacted to the event")
@@ -55,6 +689,317 @@ class SubStore(Observer):
         print("SubStore: Reacted to the event")
 
 
+class SlowSubStore(Observer):
+    def update(self, subject: Subject) -> None:
+        sleep(0.05)
+
+
+def example_dispatcher():
+    """
+    >>> dispatcher = NotificationDispatcher(max_workers=2, queue_size=5, overflow='drop_oldest')
+    >>> store = Store(dispatcher)
+    >>> slow_sub_store = SlowSubStore()
+    >>> store.attach(slow_sub_store)
+    Subject: Attached an observer.
+    >>> start = monotonic()
+    >>> for _ in range(20):
+    ...     store.buy_new_books()
+    >>> monotonic() - start < 0.05  # the publisher doesn't wait for the slow observer
+    True
+    >>> dispatcher.lag(slow_sub_store)['pending']
+    5
+    >>> dispatcher.flush()
+    >>> lag = dispatcher.lag(slow_sub_store)
+    >>> lag['pending'], lag['delivered'] + lag['dropped'], lag['dropped'] >= 14
+    (0, 20, True)
+    >>> from dataclasses import dataclass
+    >>> @dataclass
+    ... class Counter(Observer):  # unhashable, and equal to any other counter at the same count
+    ...     count: int = 0
+    ...     def update(self, subject: Subject) -> None:
+    ...         self.count += 1
+    >>> first, second = Counter(), Counter()
+    >>> dispatcher.publish(None, [first, first, second])
+    >>> dispatcher.flush()
+    >>> dispatcher.lag(first)['delivered'], dispatcher.lag(second)['delivered']
+    (2, 1)
+    >>> del first, second
+    >>> len(dispatcher._mailboxes)  # only the slow sub store's mailbox is left
+    1
+    >>> dispatcher.close()
+    """
+
+
+class AsyncSubStore(Observer):
+    def __init__(self) -> None:
+        self.received = 0
+
+    async def update(self, subject: Subject) -> None:
+        await asyncio.sleep(0.001)
+        self.received += 1
+
+
+def example_async_dispatcher():
+    """
+    >>> async def publish_on_the_loop():
+    ...     dispatcher = NotificationDispatcher(queue_size=2, loop=asyncio.get_running_loop())
+    ...     async_sub_store = AsyncSubStore()
+    ...     for _ in range(10):
+    ...         await dispatcher.publish_async(None, [async_sub_store])
+    ...     try:
+    ...         dispatcher.flush()
+    ...     except RuntimeError as error:
+    ...         print(error)
+    ...     await dispatcher.flush_async()
+    ...     return async_sub_store.received
+    >>> asyncio.run(publish_on_the_loop())
+    NotificationDispatcher: can't block on the loop thread, use await flush_async()
+    10
+    """
+
+
+class Inventory(Observer):
+    def update(self, subject: Subject) -> None:
+        print("Inventory: 1 new book")
+
+    def update_batch(self, subject: Subject, events: List[Any]) -> None:
+        print(f"Inventory: {len(events)} new books")
+
+
+def example_coalescing():
+    """
+    >>> coalescer = EventCoalescer(max_events=1000, max_delay=None)
+    >>> store = Store(coalescer=coalescer)
+    >>> inventory, man = Inventory(), Man()
+    >>> store.attach(inventory)
+    Subject: Attached an observer.
+    >>> store.attach(man)
+    Subject: Attached an observer.
+    >>> for book in range(2500):
+    ...     store.buy_new_books(book)
+    Inventory: 1000 new books
+    Man: Reacted to the event
+    Inventory: 1000 new books
+    Man: Reacted to the event
+    >>> coalescer.flush(store)
+    Inventory: 500 new books
+    Man: Reacted to the event
+    >>>
+    >>> store = Store(coalescer=EventCoalescer(max_events=1000, max_delay=0.01))
+    >>> store.attach(inventory)
+    Subject: Attached an observer.
+    >>> for book in range(10):
+    ...     store.buy_new_books(book)
+    >>> sleep(0.1)
+    Inventory: 10 new books
+    >>>
+    >>> dispatcher = NotificationDispatcher()
+    >>> store = Store(dispatcher, coalescer=EventCoalescer(max_events=100, max_delay=None))
+    >>> slow_sub_store = SlowSubStore()
+    >>> store.attach(slow_sub_store)
+    Subject: Attached an observer.
+    >>> start = monotonic()
+    >>> for book in range(200):
+    ...     store.buy_new_books(book)
+    >>> monotonic() - start < 0.05  # batches are queued, not delivered in the publisher's thread
+    True
+    >>> dispatcher.flush()
+    >>> dispatcher.lag(slow_sub_store)['delivered']
+    2
+    >>> dispatcher.close()
+    >>>
+    >>> class Ledger(Observer):
+    ...     def __init__(self):
+    ...         self.events, self.active, self.overlaps = [], 0, 0
+    ...     def update(self, subject):
+    ...         pass
+    ...     def update_batch(self, subject, events):
+    ...         self.active += 1
+    ...         self.overlaps += self.active > 1
+    ...         sleep(0.001)
+    ...         self.events.extend(events)
+    ...         self.active -= 1
+    >>> coalescer = EventCoalescer(max_events=7, max_delay=0.001)
+    >>> store, ledger = Store(coalescer=coalescer), Ledger()
+    >>> store.attach(ledger)
+    Subject: Attached an observer.
+    >>> for book in range(500):  # timer and count flushes race each other
+    ...     store.buy_new_books(book)
+    ...     sleep(0.0002)
+    >>> coalescer.flush(store)
+    >>> ledger.overlaps, ledger.events == list(range(500))
+    (0, True)
+    """
+
+
+class Reader(Observer):
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def update(self, subject: Subject) -> None:
+        print(f"Reader {self.name}: Reacted to the event")
+
+
+def example_subscriptions():
+    """
+    >>> store = Store()
+    >>> man, alice, bob = Man(), Reader("Alice"), Reader("Bob")
+    >>> store.attach(man)
+    Subject: Attached an observer.
+    >>> store.attach(alice, topics=['sci-fi', 'fantasy'])
+    Subject: Attached an observer.
+    >>> store.attach(bob, author='Lem', language='pl')
+    Subject: Attached an observer.
+    >>> store
+    Store [Observers: 3]
+    >>> store.buy_new_books({'category': 'sci-fi', 'author': 'Lem', 'language': 'pl'})
+    Man: Reacted to the event
+    Reader Alice: Reacted to the event
+    Reader Bob: Reacted to the event
+    >>> store.buy_new_books({'category': 'sci-fi', 'author': 'Lem', 'language': 'en'})
+    Man: Reacted to the event
+    Reader Alice: Reacted to the event
+    >>> store.buy_new_books({'category': 'poetry'})
+    Man: Reacted to the event
+    >>> store.detach(alice)
+    >>> store.buy_new_books({'category': 'fantasy'})
+    Man: Reacted to the event
+    >>> carol = Reader("Carol")
+    >>> store.attach(carol, topics=['sci-fi'], author='Lem')
+    Subject: Attached an observer.
+    >>> store.buy_new_books({'category': 'sci-fi', 'author': 'Dick'})
+    Man: Reacted to the event
+    >>> store.buy_new_books({'category': 'sci-fi', 'author': 'Lem'})
+    Man: Reacted to the event
+    Reader Carol: Reacted to the event
+    >>> del bob, carol  # the index forgets dead observers, events go back to the broadcast path
+    >>> store._topics, store._attributes
+    ({}, {})
+    >>> from dataclasses import dataclass
+    >>> @dataclass
+    ... class Shelf(Observer):  # unhashable, and equal to any other empty shelf
+    ...     name: str = ""
+    ...     def update(self, subject: Subject) -> None:
+    ...         print("Shelf: Reacted to the event")
+    >>> shelves = [Shelf(), Shelf()]
+    >>> for shelf in shelves:
+    ...     store.attach(shelf, topics=['poetry'])
+    Subject: Attached an observer.
+    Subject: Attached an observer.
+    >>> store.buy_new_books({'category': 'poetry'})
+    Man: Reacted to the event
+    Shelf: Reacted to the event
+    Shelf: Reacted to the event
+    >>> store.attach(Man(), topics=[['unhashable']])
+    Traceback (most recent call last):
+    ...
+    TypeError: unhashable type: 'list'
+    >>> store
+    Store [Observers: 3]
+    """
+
+
+def example_shared_memory():
+    """
+    >>> subject = SharedMemorySubject(capacity=4096)
+    >>> remote = RemoteObserver(subject.name, Inventory())
+    >>> for book in range(100):
+    ...     subject.notify({'title': f"Book {book}"})
+    >>> remote.poll(max_events=60), remote.poll(), remote.poll()
+    Inventory: 60 new books
+    Inventory: 40 new books
+    (60, 40, 0)
+    >>> for book in range(1000):
+    ...     subject.notify({'title': f"Book {book}"})
+    >>> remote.poll(), remote.overruns
+    (0, 1)
+    >>> remote.close()
+    >>> subject.close()
+    >>>
+    >>> subject = SharedMemorySubject(capacity=97)
+    >>> for book in range(30):
+    ...     subject.notify(book)
+    >>> late = RemoteObserver(subject.name, Inventory(), from_start=True)
+    >>> late.read()  # starts at the oldest whole record, not at cursor - capacity
+    [20, 21, 22, 23, 24, 25, 26, 27, 28, 29]
+    >>> late.close()
+    >>> subject.close()
+    >>>
+    >>> import multiprocessing
+    >>> subject = SharedMemorySubject(capacity=4096)
+    >>> published, results = multiprocessing.Event(), multiprocessing.Queue()
+    >>> consumer = multiprocessing.Process(target=_read_remotely, args=(subject.name, published, results))
+    >>> consumer.start()
+    >>> for book in range(50000):
+    ...     subject.notify(book)
+    >>> published.set()
+    >>> received, overruns = results.get(timeout=30)
+    >>> consumer.join()
+    >>> received == sorted(set(received)) and all(isinstance(book, int) for book in received)
+    True
+    >>> len(received) == 50000 or overruns > 0  # the consumer may skip events, but never sees a torn one
+    True
+    >>> subject.close()
+    >>>
+    >>> import subprocess
+    >>> subject = SharedMemorySubject(capacity=4096)
+    >>> subject.notify("Solaris")
+    >>> consumer = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+    ...             f"from observer import RemoteObserver; "
+    ...             f"remote = RemoteObserver({subject.name!r}, None, from_start=True); "
+    ...             f"print(remote.read()); remote.close()")
+    >>> subprocess.run([sys.executable, '-c', consumer], capture_output=True, text=True).stdout.strip()
+    "['Solaris']"
+    >>> remote = RemoteObserver(subject.name, None, from_start=True)  # still there after the consumer exited
+    >>> remote.read()
+    ['Solaris']
+    >>> remote.close()
+    >>> subject.close()
+    """
+
+
+def example_event_log():
+    """
+    >>> from tempfile import TemporaryDirectory
+    >>> directory = TemporaryDirectory()
+    >>> event_log = EventLog(os.path.join(directory.name, 'store.log'))
+    >>> store = Store(event_log=event_log)
+    >>> for book in range(2500):
+    ...     store.buy_new_books({'title': f"Book {book}"})
+    >>> late_inventory = Inventory()
+    >>> live_from = store.attach_from(late_inventory, batch_size=1000)
+    Inventory: 1000 new books
+    Inventory: 1000 new books
+    Inventory: 500 new books
+    Subject: Attached an observer.
+    >>> store.buy_new_books({'title': "Book 2500"})
+    Inventory: 1 new book
+    >>> [len(events) for _, events in event_log.replay(live_from)]
+    [1]
+    >>> event_log.close()
+    >>> with open(event_log._path, 'r+b') as file:  # a crash in the middle of the last append
+    ...     _ = file.truncate(os.path.getsize(event_log._path) - 3)
+    >>> event_log = EventLog(event_log._path)
+    >>> store = Store(event_log=event_log)
+    >>> store.attach(late_inventory)
+    Subject: Attached an observer.
+    >>> event_log.size == live_from  # the torn "Book 2500" is gone
+    True
+    >>> store.buy_new_books({'title': "Book 2501"})
+    Inventory: 1 new book
+    >>> [event['title'] for _, events in event_log.replay(live_from) for event in events]
+    ['Book 2501']
+    >>> store.buy_new_books({'title': "Solaris", 'category': 'sci-fi'})
+    Inventory: 1 new book
+    >>> sci_fi_inventory = Inventory()
+    >>> _ = store.attach_from(sci_fi_inventory, topics=['sci-fi'])  # replays only what it subscribes to
+    Inventory: 1 new books
+    Subject: Attached an observer.
+    >>> event_log.close()
+    >>> directory.cleanup()
+    """
+
+
 def main():
     """
     >>> (store := Store())
@@ -83,6 +1028,14 @@ def main():
     >>>
     >>> store.buy_new_books()
     SubStore: Reacted to the event
+    >>>
+    >>> del sub_store
+    >>> store
+    Store [Observers: 0]
+    >>> Store().attach(Man())
+    Subject: Attached an observer.
+    >>> store
+    Store [Observers: 0]
     """
     store_ = Store()
 
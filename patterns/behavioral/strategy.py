@@ -1,12 +1,24 @@
 from __future__ import annotations
 
+import heapq
+import os
+import pickle
 from abc import ABC, abstractmethod
-from typing import List
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from math import hypot, inf
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 
 class Navigator:
-    def __init__(self, strategy: AbstractRouteBuilder) -> None:
+    def __init__(self, strategy: AbstractRouteBuilder, cache: Optional[RouteCache] = None) -> None:
         self._strategy = strategy
+        self._cache = cache
 
     @property
     def strategy(self) -> AbstractRouteBuilder:
@@ -16,9 +28,66 @@ class Navigator:
     def strategy(self, strategy: AbstractRouteBuilder) -> None:
         self._strategy = strategy
 
-    def build_route(self) -> None:
-        result = self._strategy.do_route(["a", "b", "c", "d", "e"])
-        print(" -> ".join(result))
+    def route(self, waypoints: Sequence) -> List:
+        if self._cache is not None:
+            return self._cache.route(self._strategy, waypoints)
+        return self._strategy.do_route(list(waypoints))
+
+    def build_route(self, waypoints: Optional[Sequence] = None) -> None:
+        if waypoints is None:
+            waypoints = ["a", "b", "c", "d", "e"]
+        print(" -> ".join(map(str, self.route(waypoints))))
+
+
+class AdaptiveNavigator(Navigator):
+    """
+    Routes every call to the fastest of `candidates` (which must build equal routes) for inputs of that size.
+    Sizes are grouped into power-of-two buckets. In each bucket every candidate is timed `min_samples` times,
+    after that the least sampled one is tried on every `explore_every`-th call and the fastest one on the rest.
+    Runtimes are exponential moving averages with weight `decay` for the newest sample.
+    """
+
+    def __init__(self, candidates: Sequence[AbstractRouteBuilder], min_samples: int = 3, explore_every: int = 50,
+                 decay: float = 0.2) -> None:
+        super().__init__(candidates[0])
+        self._candidates = list(candidates)
+        self._min_samples = min_samples
+        self._explore_every = explore_every
+        self._decay = decay
+        self._buckets: Dict[int, List[List[float]]] = {}  # bucket -> [average seconds, samples] per candidate
+        self._calls: Counter = Counter()
+
+    def _choose(self, bucket: int) -> int:
+        stats = self._buckets.setdefault(bucket, [[0.0, 0] for _ in self._candidates])
+        self._calls[bucket] += 1
+        for index, (_, samples) in enumerate(stats):
+            if samples < self._min_samples:
+                return index
+        if self._calls[bucket] % self._explore_every == 0:
+            return min(range(len(stats)), key=lambda i: stats[i][1])
+        return min(range(len(stats)), key=lambda i: stats[i][0])
+
+    def route(self, waypoints: Sequence) -> List:
+        bucket = len(waypoints).bit_length()
+        index = self._choose(bucket)
+        self._strategy = self._candidates[index]
+        start = perf_counter()
+        result = self._strategy.do_route(list(waypoints))
+        elapsed = perf_counter() - start
+
+        stats = self._buckets[bucket][index]
+        stats[0] = elapsed if not stats[1] else (1 - self._decay) * stats[0] + self._decay * elapsed
+        stats[1] += 1
+        return result
+
+    def stats(self) -> Dict[int, Dict[str, float]]:
+        """
+        Average runtime of every candidate per bucket; bucket `b` holds inputs of 2 ** (b - 1) to 2 ** b - 1 waypoints.
+        """
+        return {
+            bucket: {type(candidate).__name__: stats[0] for candidate, stats in zip(self._candidates, bucket_stats)}
+            for bucket, bucket_stats in sorted(self._buckets.items())
+        }
 
 
 class AbstractRouteBuilder(ABC):
@@ -26,6 +95,63 @@ class AbstractRouteBuilder(ABC):
     def do_route(self, data: List):
         pass
 
+    def cache_key(self) -> Hashable:
+        """
+        Identity of the strategy for RouteCache: builders with equal keys build equal routes.
+        None keeps the routes out of the cache, for builders whose `do_route` has to run every time.
+        """
+        return type(self)
+
+
+class RouteCache:
+    """
+    LRU of up to `max_size` routes keyed on the strategy's `cache_key()` and the waypoints.
+    Routes of unhashable waypoints, or of strategies without a key, are built every time.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        self._max_size = max_size
+        self._routes: OrderedDict[Tuple[Hashable, Tuple], Tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def route(self, strategy: AbstractRouteBuilder, waypoints: Sequence) -> List:
+        strategy_key = strategy.cache_key()
+        if strategy_key is None:
+            self.misses += 1
+            return strategy.do_route(list(waypoints))
+        key = (strategy_key, tuple(waypoints))
+        try:
+            route = self._routes.get(key)
+        except TypeError:  # unhashable waypoints
+            self.misses += 1
+            return strategy.do_route(list(waypoints))
+        if route is not None:
+            self._routes.move_to_end(key)
+            self.hits += 1
+            return list(route)
+
+        self.misses += 1
+        route = tuple(strategy.do_route(list(waypoints)))
+        self._routes[key] = route
+        if len(self._routes) > self._max_size:
+            self._routes.popitem(last=False)
+        return list(route)
+
+    def invalidate(self, strategy: Optional[AbstractRouteBuilder] = None,
+                   waypoints: Optional[Sequence] = None) -> None:
+        """
+        Drops the routes of `strategy`, of `waypoints` or of both; everything if neither is given.
+        """
+        strategy_key = strategy.cache_key() if strategy is not None else None
+        waypoints = tuple(waypoints) if waypoints is not None else None
+        for key in list(self._routes):
+            if (strategy_key is None or key[0] == strategy_key) and (waypoints is None or key[1] == waypoints):
+                del self._routes[key]
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
 
 class RouteBuilder(AbstractRouteBuilder):
     def do_route(self, data: List) -> List:
@@ -37,6 +163,551 @@ class RevRouteBuilder(AbstractRouteBuilder):
         return list(reversed(sorted(data)))
 
 
+class SortedWaypoints:
+    """
+    Sorted multiset kept as a list of sorted chunks of up to `2 * load` items and the maximum of every chunk.
+    Finding the chunk is a bisect over the maximums and inserting moves at most one chunk, so edits stay cheap
+    for large n, and iterating in either direction needs no copy.
+    """
+
+    def __init__(self, waypoints: Iterable = (), load: int = 512) -> None:
+        self._load = load
+        items = sorted(waypoints)
+        self._chunks: List[List] = [items[i:i + load] for i in range(0, len(items), load)]
+        self._maxes: List = [chunk[-1] for chunk in self._chunks]
+        self._size = len(items)
+
+    def add(self, waypoint: Any) -> None:
+        if not self._chunks:
+            self._chunks.append([waypoint])
+            self._maxes.append(waypoint)
+        else:
+            index = min(bisect_left(self._maxes, waypoint), len(self._chunks) - 1)
+            chunk = self._chunks[index]
+            insort(chunk, waypoint)
+            self._maxes[index] = chunk[-1]
+            if len(chunk) > 2 * self._load:
+                self._chunks[index:index + 1] = [chunk[:self._load], chunk[self._load:]]
+                self._maxes[index:index + 1] = [chunk[self._load - 1], chunk[-1]]
+        self._size += 1
+
+    def remove(self, waypoint: Any) -> None:
+        index = bisect_left(self._maxes, waypoint)
+        if index < len(self._chunks):
+            chunk = self._chunks[index]
+            position = bisect_left(chunk, waypoint)
+            if position < len(chunk) and chunk[position] == waypoint:
+                del chunk[position]
+                if chunk:
+                    self._maxes[index] = chunk[-1]
+                else:
+                    del self._chunks[index]
+                    del self._maxes[index]
+                self._size -= 1
+                return
+        raise ValueError(f"{waypoint!r} is not in the route")
+
+    def __contains__(self, waypoint: Any) -> bool:
+        index = bisect_left(self._maxes, waypoint)
+        if index == len(self._chunks):
+            return False
+        chunk = self._chunks[index]
+        return chunk[bisect_left(chunk, waypoint)] == waypoint
+
+    def count(self, waypoint: Any) -> int:
+        start = bisect_left(self._maxes, waypoint)
+        end = bisect_right(self._maxes, waypoint)
+        return sum(bisect_right(chunk, waypoint) - bisect_left(chunk, waypoint)
+                   for chunk in self._chunks[start:end + 1])
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator:
+        return chain.from_iterable(self._chunks)
+
+    def __reversed__(self) -> Iterator:
+        return chain.from_iterable(map(reversed, reversed(self._chunks)))
+
+
+class IncrementalRouteBuilder(AbstractRouteBuilder):
+    """
+    Keeps the route in a SortedWaypoints that can be shared with other incremental builders.
+    `do_route` only applies the difference between the data and the current waypoints instead of sorting again.
+    It updates the waypoints as a side effect, so its routes are never served from a RouteCache.
+    """
+    reverse = False
+
+    def __init__(self, waypoints: Optional[SortedWaypoints] = None) -> None:
+        self.waypoints = waypoints if waypoints is not None else SortedWaypoints()
+
+    def cache_key(self) -> Hashable:
+        return None
+
+    def add_waypoint(self, waypoint: Any) -> None:
+        self.waypoints.add(waypoint)
+
+    def remove_waypoint(self, waypoint: Any) -> None:
+        self.waypoints.remove(waypoint)
+
+    def route(self) -> Iterator:
+        return reversed(self.waypoints) if self.reverse else iter(self.waypoints)
+
+    def do_route(self, data: List) -> List:
+        wanted = Counter(data)
+        current = Counter({waypoint: self.waypoints.count(waypoint) for waypoint in wanted})
+        if sum(current.values()) != len(self.waypoints):  # some waypoints are gone, find them the slow way
+            current = Counter(self.waypoints)
+        for waypoint, count in (current - wanted).items():
+            for _ in range(count):
+                self.waypoints.remove(waypoint)
+        for waypoint, count in (wanted - current).items():
+            for _ in range(count):
+                self.waypoints.add(waypoint)
+        return list(self.route())
+
+
+class IncrementalRevRouteBuilder(IncrementalRouteBuilder):
+    reverse = True
+
+
+def _write_sorted_run(waypoints: List, path: str, block_size: int) -> str:
+    waypoints.sort()
+    with open(path, 'wb') as file:
+        for start in range(0, len(waypoints), block_size):
+            pickle.dump(waypoints[start:start + block_size], file, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _write_merged_run(runs: List[str], path: str, block_size: int) -> str:
+    merged = heapq.merge(*(_read_sorted_run(run) for run in runs))
+    with open(path, 'wb') as file:
+        while block := list(islice(merged, block_size)):
+            pickle.dump(block, file, pickle.HIGHEST_PROTOCOL)
+    for run in runs:
+        os.remove(run)
+    return path
+
+
+def _read_sorted_run(path: str) -> Iterator:
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                block = pickle.load(file)
+            except EOFError:
+                return
+            yield from block
+
+
+class ExternalSortRouteBuilder(AbstractRouteBuilder):
+    """
+    Sorts waypoints that may not fit into memory: the input is read in `chunk_size` chunks, which are sorted
+    by a pool of `processes` workers (in this process if 0) and spilled to temporary files, then the runs are
+    merged lazily with heapq.merge. About `processes + 2` chunks are held in memory at a time.
+    At most `max_fan_in` runs are open at once: while there are more, groups of them are merged
+    into longer intermediate runs first.
+    With `top_k` only the first `top_k` waypoints are kept, in memory, and nothing is spilled.
+    """
+
+    def __init__(self, chunk_size: int = 100_000, processes: Optional[int] = None, top_k: Optional[int] = None,
+                 directory: Optional[str] = None, block_size: int = 1024, max_fan_in: int = 64) -> None:
+        if max_fan_in < 2:
+            raise ValueError("max_fan_in must be at least 2")
+        self._chunk_size = chunk_size
+        self._processes = (os.cpu_count() or 1) if processes is None else processes
+        self._top_k = top_k
+        self._directory = directory
+        self._block_size = block_size
+        self._max_fan_in = max_fan_in
+
+    def cache_key(self) -> Hashable:
+        return type(self), self._top_k
+
+    def do_route(self, data: Iterable) -> List:
+        return list(self.iter_route(data))
+
+    @staticmethod
+    def read_waypoints(path: str) -> Iterator[str]:
+        with open(path) as file:
+            for line in file:
+                yield line.rstrip("\n")
+
+    def iter_route(self, waypoints: Iterable) -> Iterator:
+        if self._top_k is not None:
+            return iter(heapq.nsmallest(self._top_k, waypoints))
+        return self._merge_sorted_runs(iter(waypoints))
+
+    def _merge_sorted_runs(self, waypoints: Iterator) -> Iterator:
+        first = list(islice(waypoints, self._chunk_size))
+        if len(first) < self._chunk_size:
+            yield from sorted(first)
+            return
+
+        head = [first]
+        del first
+        with TemporaryDirectory(dir=self._directory) as directory:
+            paths = (os.path.join(directory, f"run-{number}.bin") for number in range(1 << 62))
+            runs = self._spill_sorted_runs(self._chunks(head, waypoints), paths)
+            while len(runs) > self._max_fan_in:
+                runs = [_write_merged_run(runs[start:start + self._max_fan_in], next(paths), self._block_size)
+                        for start in range(0, len(runs), self._max_fan_in)]
+            yield from heapq.merge(*(_read_sorted_run(path) for path in runs))
+
+    def _chunks(self, head: List[List], waypoints: Iterator) -> Iterator[List]:
+        yield head.pop()
+        while chunk := list(islice(waypoints, self._chunk_size)):
+            yield chunk
+
+    def _spill_sorted_runs(self, chunks: Iterator[List], paths: Iterator[str]) -> List[str]:
+        if not self._processes:
+            return [_write_sorted_run(chunk, next(paths), self._block_size) for chunk in chunks]
+
+        runs = []
+        pending: deque[Future] = deque()
+        with ProcessPoolExecutor(self._processes) as pool:
+            for chunk in chunks:
+                if len(pending) >= self._processes:
+                    runs.append(pending.popleft().result())
+                pending.append(pool.submit(_write_sorted_run, chunk, next(paths), self._block_size))
+            runs.extend(future.result() for future in pending)
+        return runs
+
+
+class Graph:
+    """
+    Weighted graph as adjacency lists; edges are two-way unless `directed` is set.
+    `version` counts the changes, so routes cached for an older version are not reused.
+    """
+
+    def __init__(self, directed: bool = False) -> None:
+        self.directed = directed
+        self.version = 0
+        self.edges: Dict[Hashable, List[Tuple[Hashable, float]]] = defaultdict(list)
+        self.reverse_edges: Dict[Hashable, List[Tuple[Hashable, float]]] = \
+            defaultdict(list) if directed else self.edges
+
+    def add_edge(self, source: Hashable, target: Hashable, weight: float = 1.0) -> None:
+        self.edges[source].append((target, weight))
+        # reverse_edges is edges itself in an undirected graph
+        self.reverse_edges[target].append((source, weight))
+        self.version += 1
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self.edges or node in self.reverse_edges
+
+    def nodes(self) -> List[Hashable]:
+        return list(dict.fromkeys([*self.edges, *self.reverse_edges]))
+
+
+def shortest_distances(edges: Dict[Hashable, List[Tuple[Hashable, float]]], source: Hashable) -> Dict[Hashable, float]:
+    distances = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        distance, node = heapq.heappop(heap)
+        if distance > distances[node]:
+            continue
+        for neighbour, weight in edges.get(node, ()):
+            candidate = distance + weight
+            if candidate < distances.get(neighbour, inf):
+                distances[neighbour] = candidate
+                heapq.heappush(heap, (candidate, neighbour))
+    return distances
+
+
+class GraphRouteBuilder(AbstractRouteBuilder):
+    """
+    Treats the data as waypoints on `graph` and joins the shortest paths between consecutive ones.
+    """
+
+    def __init__(self, graph: Graph) -> None:
+        self._graph = graph
+
+    def cache_key(self) -> Hashable:
+        return type(self), self._graph, self._graph.version
+
+    def do_route(self, data: List) -> List:
+        route = data[:1]
+        for source, target in zip(data, data[1:]):
+            route.extend(self.shortest_path(source, target)[1:])
+        return route
+
+    def heuristic(self, node: Hashable, target: Hashable) -> float:
+        return 0.0
+
+    def shortest_path(self, source: Hashable, target: Hashable) -> List:
+        """
+        A* search with `heuristic`; with the default zero heuristic this is Dijkstra's algorithm.
+        """
+        if source not in self._graph or target not in self._graph:
+            raise ValueError(f"No route from {source!r} to {target!r}")
+        edges = self._graph.edges
+        heuristic = self.heuristic
+        distances = {source: 0.0}
+        previous = {}
+        heap = [(heuristic(source, target), 0.0, source)]
+        while heap:
+            _, distance, node = heapq.heappop(heap)
+            if node == target:
+                path = [target]
+                while path[-1] != source:
+                    path.append(previous[path[-1]])
+                return path[::-1]
+            if distance > distances[node]:
+                continue
+            for neighbour, weight in edges.get(node, ()):
+                candidate = distance + weight
+                if candidate < distances.get(neighbour, inf):
+                    distances[neighbour] = candidate
+                    previous[neighbour] = node
+                    heapq.heappush(heap, (candidate + heuristic(neighbour, target), candidate, neighbour))
+        raise ValueError(f"No route from {source!r} to {target!r}")
+
+
+class DijkstraRouteBuilder(GraphRouteBuilder):
+    pass
+
+
+class AStarRouteBuilder(GraphRouteBuilder):
+    """
+    `heuristic(node, target)` must never overestimate the remaining distance.
+    """
+
+    def __init__(self, graph: Graph, heuristic: Callable[[Hashable, Hashable], float]) -> None:
+        super().__init__(graph)
+        self.heuristic = heuristic
+
+
+def euclidean_heuristic(coordinates: Dict[Hashable, Tuple[float, float]]) -> Callable[[Hashable, Hashable], float]:
+    def heuristic(node: Hashable, target: Hashable) -> float:
+        (x1, y1), (x2, y2) = coordinates[node], coordinates[target]
+        return hypot(x2 - x1, y2 - y1)
+
+    return heuristic
+
+
+class LandmarkIndex:
+    """
+    Distances from and to a few landmarks (ALT). By the triangle inequality
+    max(d(L, t) - d(L, v), d(v, L) - d(t, L)) is a lower bound of d(v, t) for every landmark L.
+    `version` is the `Graph.version` the distances were computed for; the bounds are only valid for that one.
+    """
+
+    def __init__(self, nodes: List[Hashable], from_landmarks: List[array], to_landmarks: List[array],
+                 version: Optional[int] = None) -> None:
+        self.nodes = nodes
+        self._positions = {node: position for position, node in enumerate(nodes)}
+        self._from_landmarks = from_landmarks
+        self._to_landmarks = to_landmarks
+        self.version = version
+
+    @property
+    def landmarks_count(self) -> int:
+        return len(self._from_landmarks)
+
+    @classmethod
+    def build(cls, graph: Graph, landmarks_count: int = 8) -> LandmarkIndex:
+        """
+        Picks landmarks far from each other: every next one is the node farthest from those already picked.
+        """
+        nodes = graph.nodes()
+        positions = {node: position for position, node in enumerate(nodes)}
+        from_landmarks, to_landmarks = [], []
+        if not nodes:
+            return cls(nodes, from_landmarks, to_landmarks, graph.version)
+        closest = [inf] * len(nodes)
+        landmark = nodes[0]
+        for _ in range(min(landmarks_count, len(nodes))):
+            forward = cls._as_array(shortest_distances(graph.edges, landmark), positions)
+            backward = forward if not graph.directed else \
+                cls._as_array(shortest_distances(graph.reverse_edges, landmark), positions)
+            from_landmarks.append(forward)
+            to_landmarks.append(backward)
+            closest = [min(old, new) for old, new in zip(closest, forward)]
+            reachable = [(distance, position) for position, distance in enumerate(closest) if distance < inf]
+            landmark = nodes[max(reachable)[1]]
+        return cls(nodes, from_landmarks, to_landmarks, graph.version)
+
+    @staticmethod
+    def _as_array(distances: Dict[Hashable, float], positions: Dict[Hashable, int]) -> array:
+        values = array('d', [inf]) * len(positions)
+        for node, distance in distances.items():
+            values[positions[node]] = distance
+        return values
+
+    def lower_bound(self, node: Hashable, target: Hashable) -> float:
+        v, t = self._positions[node], self._positions[target]
+        best = 0.0
+        for from_landmark, to_landmark in zip(self._from_landmarks, self._to_landmarks):
+            if from_landmark[t] < inf and from_landmark[v] < inf:
+                best = max(best, from_landmark[t] - from_landmark[v])
+            if to_landmark[v] < inf and to_landmark[t] < inf:
+                best = max(best, to_landmark[v] - to_landmark[t])
+        return best
+
+    def save(self, path: str) -> None:
+        with open(path, 'wb') as file:
+            pickle.dump((self.nodes, self._from_landmarks, self._to_landmarks, self.version), file,
+                        pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> LandmarkIndex:
+        with open(path, 'rb') as file:
+            return cls(*pickle.load(file))
+
+
+class ALTRouteBuilder(GraphRouteBuilder):
+    """
+    An index built for another version of the graph is rebuilt, with as many landmarks, before the next search.
+    """
+
+    def __init__(self, graph: Graph, index: Optional[LandmarkIndex] = None) -> None:
+        super().__init__(graph)
+        self.index = index or LandmarkIndex.build(graph)
+
+    def shortest_path(self, source: Hashable, target: Hashable) -> List:
+        if self.index.version != self._graph.version:
+            self.index = LandmarkIndex.build(self._graph, self.index.landmarks_count or 8)
+        return super().shortest_path(source, target)
+
+    def heuristic(self, node: Hashable, target: Hashable) -> float:
+        return self.index.lower_bound(node, target)
+
+
+def example_graph_routes():
+    """
+    >>> coordinates = {(x, y): (x, y) for x in range(30) for y in range(30)}
+    >>> grid = Graph()
+    >>> for x, y in coordinates:
+    ...     if x + 1 < 30:
+    ...         grid.add_edge((x, y), (x + 1, y), 1.0 if y % 7 else 3.0)
+    ...     if y + 1 < 30:
+    ...         grid.add_edge((x, y), (x, y + 1), 1.0)
+    >>> routes = [
+    ...     builder.do_route([(0, 0), (29, 29), (15, 0)])
+    ...     for builder in (DijkstraRouteBuilder(grid),
+    ...                     AStarRouteBuilder(grid, euclidean_heuristic(coordinates)),
+    ...                     ALTRouteBuilder(grid, LandmarkIndex.build(grid, landmarks_count=4)))
+    ... ]
+    >>> def length(route):
+    ...     return sum(dict(grid.edges[a])[b] for a, b in zip(route, route[1:]))
+    >>> [length(route) for route in routes]
+    [101.0, 101.0, 101.0]
+    >>> alt = ALTRouteBuilder(grid)
+    >>> grid.add_edge((29, 29), (-1, -1), 0.5)  # a new node, the landmark index is rebuilt
+    >>> grid.add_edge((-1, -1), (0, 0), 0.5)
+    >>> alt.do_route([(29, 29), (0, 0)])
+    [(29, 29), (-1, -1), (0, 0)]
+    >>> alt.index.version == grid.version
+    True
+    >>> LandmarkIndex.build(Graph()).landmarks_count
+    0
+    >>> pair = Graph()
+    >>> pair.add_edge('a', 'b')
+    >>> dict(pair.edges)
+    {'a': [('b', 1.0)], 'b': [('a', 1.0)]}
+    >>> navi = Navigator(DijkstraRouteBuilder(grid), RouteCache())
+    >>> navi.build_route([(0, 0), (0, 2), (1, 2)])
+    (0, 0) -> (0, 1) -> (0, 2) -> (1, 2)
+    >>> grid.add_edge((0, 0), (1, 2), 0.5)  # the cached route is stale now
+    >>> navi.build_route([(0, 0), (0, 2), (1, 2)])
+    (0, 0) -> (1, 2) -> (0, 2) -> (1, 2)
+    """
+
+
+def example_incremental_routes():
+    """
+    >>> waypoints = SortedWaypoints(["c", "a", "e"])
+    >>> forward, backward = IncrementalRouteBuilder(waypoints), IncrementalRevRouteBuilder(waypoints)
+    >>> forward.add_waypoint("b")
+    >>> forward.add_waypoint("d")
+    >>> list(forward.route()), list(backward.route())
+    (['a', 'b', 'c', 'd', 'e'], ['e', 'd', 'c', 'b', 'a'])
+    >>> backward.remove_waypoint("c")
+    >>> navi = Navigator(forward)
+    >>> navi.build_route(["a", "b", "d", "e", "f"])
+    a -> b -> d -> e -> f
+    >>> navi.strategy = backward
+    >>> navi.build_route(["a", "d", "f"])
+    f -> d -> a
+    >>> navi = Navigator(IncrementalRouteBuilder(), RouteCache())
+    >>> for waypoints in (["a", "b"], ["c"], ["a", "b"]):
+    ...     navi.build_route(waypoints)
+    a -> b
+    c
+    a -> b
+    >>> list(navi.strategy.route())  # built again, not served from the cache, so the structure is in sync
+    ['a', 'b']
+    """
+
+
+def example_external_sort():
+    """
+    >>> from random import Random
+    >>> waypoints = [f"wp-{Random(seed).randrange(10 ** 6):06d}" for seed in range(5000)]
+    >>> external = ExternalSortRouteBuilder(chunk_size=1000, processes=2)
+    >>> external.do_route(waypoints) == sorted(waypoints)
+    True
+    >>> narrow = ExternalSortRouteBuilder(chunk_size=10, processes=0, max_fan_in=8)  # 500 runs, 3 merge passes
+    >>> narrow.do_route(waypoints) == sorted(waypoints)
+    True
+    >>> ExternalSortRouteBuilder(top_k=3).do_route(iter(waypoints)) == sorted(waypoints)[:3]
+    True
+    >>> route_cache = RouteCache()
+    >>> navi = Navigator(ExternalSortRouteBuilder(chunk_size=2, processes=0), route_cache)
+    >>> navi.build_route()
+    a -> b -> c -> d -> e
+    >>> navi.strategy = ExternalSortRouteBuilder(top_k=2)  # a different route, not a cache hit
+    >>> navi.build_route()
+    a -> b
+    >>> route_cache.hits
+    0
+    """
+
+
+def example_adaptive_navigator():
+    """
+    >>> from time import sleep
+    >>> class SlowRouteBuilder(RouteBuilder):
+    ...     def do_route(self, data):
+    ...         sleep(0.002)
+    ...         return super().do_route(data)
+    >>> navi = AdaptiveNavigator([SlowRouteBuilder(), RouteBuilder()], min_samples=2, explore_every=10)
+    >>> for _ in range(21):
+    ...     _ = navi.route(["e", "d", "c", "b", "a"])
+    >>> navi.build_route()
+    a -> b -> c -> d -> e
+    >>> type(navi.strategy).__name__
+    'RouteBuilder'
+    >>> stats = navi.stats()[3]
+    >>> stats['SlowRouteBuilder'] > stats['RouteBuilder']
+    True
+    """
+
+
+def example_route_cache():
+    """
+    >>> route_cache = RouteCache(max_size=100)
+    >>> navi = Navigator(RouteBuilder(), route_cache)
+    >>> navi.build_route()
+    a -> b -> c -> d -> e
+    >>> navi.strategy = RevRouteBuilder()
+    >>> navi.build_route()
+    e -> d -> c -> b -> a
+    >>> navi.strategy = RouteBuilder()
+    >>> navi.build_route()
+    a -> b -> c -> d -> e
+    >>> route_cache.hits, route_cache.misses
+    (1, 2)
+    >>> route_cache.invalidate(RouteBuilder())
+    >>> len(route_cache)
+    1
+    >>> navi.build_route([["b"], ["a"]])  # unhashable waypoints bypass the cache
+    ['a'] -> ['b']
+    >>> len(route_cache)
+    1
+    """
+
+
 def main():
     """
     >>> navi = Navigator(RouteBuilder())